@@ -0,0 +1,262 @@
+"""
+Caches used to avoid downloading and processing documents again.
+"""
+
+import json
+import logging
+import os
+import re
+
+from collections import OrderedDict
+from hashlib import blake2b, sha1
+from threading import Lock
+from typing import Any
+
+from lxml.html import HtmlElement
+
+from .core import DocumentContext, find_date
+from .settings import CACHE_SIZE
+from .utils import is_url
+
+LOGGER = logging.getLogger(__name__)
+
+# file names of the results spilled to disk (see ResultCache.make_key())
+RESULT_KEY = re.compile(r"[0-9a-f]{32}$")
+
+
+class HTTPCache:
+    """Disk-backed cache storing HTTP validators (ETag and Last-Modified)
+    and the dates previously extracted for each URL, so that unchanged
+    documents can be answered by a conditional request (304 response)."""
+
+    __slots__ = ["directory"]
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        "Determine the file name of the entry for a given URL."
+        return os.path.join(self.directory, sha1(url.encode("utf-8")).hexdigest())
+
+    def get(self, url: str) -> dict[str, Any] | None:
+        "Return the stored entry for a given URL or None."
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as cachefile:
+                entry: dict[str, Any] = json.load(cachefile)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            LOGGER.warning("cannot read cache entry for %s: %s", url, err)
+            return None
+        return entry if entry.get("url") == url else None
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        "Return the request headers needed to check if the document has changed."
+        entry = self.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last-modified"):
+            headers["If-Modified-Since"] = entry["last-modified"]
+        return headers
+
+    def lookup(self, url: str, key: str) -> tuple[bool, str | None]:
+        """Look for a date extracted with the given set of options and
+        return a tuple (found, date), the date being possibly None."""
+        dates = (self.get(url) or {}).get("dates", {})
+        return key in dates, dates.get(key)
+
+    def store(
+        self, url: str, headers: dict[str, str], key: str, date: str | None
+    ) -> None:
+        """Store the validators of a response and the date extracted with the
+        given set of options. Dates found for other options are kept as long
+        as the document doesn't change."""
+        entry = self.get(url) or {}
+        validators: dict[str, Any] = {
+            field: headers[field]
+            for field in ("etag", "last-modified")
+            if field in headers
+        }
+        # the document has changed or cannot be checked
+        if not validators or any(
+            entry.get(field) != value for field, value in validators.items()
+        ):
+            entry = validators
+        entry["url"] = url
+        entry.setdefault("dates", {})[key] = date
+        # write to a temporary file first to prevent corrupted entries
+        path = self._path(url)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as cachefile:
+                json.dump(entry, cachefile)
+            os.replace(path + ".tmp", path)
+        except OSError as err:
+            LOGGER.warning("cannot write cache entry for %s: %s", url, err)
+
+
+class ResultCache:
+    """Bounded cache of find_date() results keyed by a hash of the input
+    document and the chosen options, so that duplicate documents (e.g.
+    syndicated content) are not processed again. Entries evicted from
+    memory can be stored on disk if a directory is given, up to disksize
+    entries."""
+
+    __slots__ = [
+        "directory",
+        "disksize",
+        "hits",
+        "lock",
+        "maxsize",
+        "misses",
+        "results",
+        "spilled",
+    ]
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_SIZE,
+        directory: str | None = None,
+        disksize: int = 16 * CACHE_SIZE,
+    ):
+        self.directory = directory
+        self.disksize = disksize
+        self.hits = 0
+        self.lock = Lock()
+        self.maxsize = maxsize
+        self.misses = 0
+        self.results: OrderedDict[str, str | None] = OrderedDict()
+        # keys of the results on disk, least recently written first
+        self.spilled: OrderedDict[str, None] = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            # results spilled by previous instances
+            entries = sorted(
+                (
+                    entry
+                    for entry in os.scandir(directory)
+                    if RESULT_KEY.match(entry.name)
+                ),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            self.spilled.update((entry.name, None) for entry in entries)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    @staticmethod
+    def make_key(data: bytes | str, options: dict[str, Any]) -> str:
+        "Hash the input document along with the extraction options."
+        hashed = blake2b(
+            data.encode("utf-8", "surrogatepass") if isinstance(data, str) else data,
+            digest_size=16,
+        )
+        hashed.update(repr(sorted(options.items())).encode("utf-8"))
+        return hashed.hexdigest()
+
+    def _read(self, key: str) -> tuple[bool, str | None]:
+        "Look for a result spilled to disk."
+        if self.directory is None:
+            return False, None
+        try:
+            with open(
+                os.path.join(self.directory, key), "r", encoding="utf-8"
+            ) as cachefile:
+                return True, json.load(cachefile)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            LOGGER.warning("cannot read cached result %s: %s", key, err)
+        return False, None
+
+    def _write(self, key: str, result: str | None) -> None:
+        "Spill a result to disk and remove the oldest ones if necessary."
+        if self.directory is None:
+            return
+        try:
+            with open(
+                os.path.join(self.directory, key), "w", encoding="utf-8"
+            ) as cachefile:
+                json.dump(result, cachefile)
+        except OSError as err:
+            LOGGER.warning("cannot write cached result %s: %s", key, err)
+            return
+        removed = []
+        with self.lock:
+            self.spilled[key] = None
+            self.spilled.move_to_end(key)
+            while len(self.spilled) > self.disksize:
+                removed.append(self.spilled.popitem(last=False)[0])
+        self._remove(removed)
+
+    def _remove(self, keys: list[str]) -> None:
+        "Delete results spilled to disk."
+        if self.directory is None:
+            return
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                LOGGER.warning("cannot remove cached result %s: %s", key, err)
+
+    def get(self, key: str) -> tuple[bool, str | None]:
+        "Return a tuple (found, result) and update the counters."
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return True, self.results[key]
+        found, result = self._read(key)
+        with self.lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            self.put(key, result)
+        return found, result
+
+    def put(self, key: str, result: str | None) -> None:
+        "Store a result and evict the least recently used ones if necessary."
+        evicted = []
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.maxsize:
+                evicted.append(self.results.popitem(last=False))
+        for item in evicted:
+            self._write(*item)
+
+    def clear(self) -> None:
+        "Empty the cache in memory and on disk and reset the counters."
+        with self.lock:
+            self.results.clear()
+            removed = list(self.spilled)
+            self.spilled.clear()
+            self.hits = self.misses = 0
+        self._remove(removed)
+
+    def find_date(
+        self, htmlobject: bytes | str | HtmlElement | DocumentContext, **kwargs: Any
+    ) -> str | None:
+        """Same as htmldate.core.find_date() with cached results. Trees,
+        document contexts and URLs are passed through since their content
+        cannot be hashed cheaply."""
+        if not isinstance(htmlobject, (bytes, str)) or is_url(htmlobject):
+            return find_date(htmlobject, **kwargs)
+        # a trace is specific to a call and doesn't change the result
+        trace = kwargs.get("trace")
+        key = self.make_key(
+            htmlobject, {k: v for k, v in kwargs.items() if k != "trace"}
+        )
+        found, result = self.get(key)
+        if found and trace is not None:
+            trace.add("result_cache", result)
+            trace.result = result
+        if not found:
+            result = find_date(htmlobject, **kwargs)
+            self.put(key, result)
+        return result
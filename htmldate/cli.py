@@ -6,12 +6,15 @@ import argparse
 import logging
 import sys
 
+from collections.abc import Iterable
+from itertools import islice
 from platform import python_version
 
 from lxml.html import HtmlElement
 
 from . import __version__
-from .core import find_date
+from .core import find_date, find_dates_from_urls
+from .settings import URL_BATCH_SIZE
 from .utils import fetch_url, is_wrong_document
 
 
@@ -34,6 +37,21 @@ def cli_examine(
     )
 
 
+def cli_urls(lines: Iterable[str], args: argparse.Namespace) -> None:
+    """Write the dates found in a list of URLs, one per line"""
+    urls = (line.strip() for line in lines)
+    while batch := list(islice(urls, URL_BATCH_SIZE)):
+        results = find_dates_from_urls(
+            batch,
+            extensive_search=not args.fast,
+            min_date=args.mindate,
+            max_date=args.maxdate,
+        )
+        sys.stdout.writelines(
+            f"{url}\t{result or 'None'}\n" for url, result in zip(batch, results)
+        )
+
+
 def parse_args(args: list[str]) -> argparse.Namespace:
     """Define parser for command-line arguments"""
     argsparser = argparse.ArgumentParser()
@@ -57,6 +75,11 @@ def parse_args(args: list[str]) -> argparse.Namespace:
         "-max", "--maxdate", help="latest acceptable date (ISO 8601 YMD)", type=str
     )
     argsparser.add_argument("-u", "--URL", help="custom URL download", type=str)
+    argsparser.add_argument(
+        "--urls-only",
+        help="extract dates from a list of URLs without downloading them",
+        action="store_true",
+    )
     argsparser.add_argument(
         "-v", "--verbose", help="increase output verbosity", action="store_true"
     )
@@ -75,8 +98,16 @@ def process_args(args: argparse.Namespace) -> None:
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
+    # dates in the URLs, from a file or from STDIN
+    if args.urls_only:
+        if args.inputfile:
+            with open(args.inputfile, mode="r", encoding="utf-8") as inputfile:
+                cli_urls(inputfile, args)
+        else:
+            cli_urls(sys.stdin, args)
+
     # input type
-    if not args.inputfile:
+    elif not args.inputfile:
         # URL as input
         if args.URL:
             htmlstring = fetch_url(args.URL)
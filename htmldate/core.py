@@ -7,27 +7,37 @@ import logging
 import re
 
 from collections import Counter
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from copy import deepcopy
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import lru_cache, partial
+from itertools import islice
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
 
 from lxml.html import HtmlElement, tostring
 
 # own
 from .extractors import (
+    cms_search,
+    detect_cms,
     discard_unwanted,
     extract_url_date,
+    extract_url_dates,
     idiosyncrasies_search,
     img_search,
     json_search,
     regex_parse,
     pattern_search,
+    state_search,
     try_date_expr,
     DATE_EXPRESSIONS,
     FAST_PREPEND,
     SLOW_PREPEND,
     FREE_TEXT_EXPRESSIONS,
+    METADATA_EXPRESSION,
     YEAR_PATTERN,
     YMD_PATTERN,
     COPYRIGHT_PATTERN,
@@ -52,17 +62,34 @@ from .extractors import (
     THREE_COMP_REGEX_B,
     TWO_COMP_REGEX,
 )
+from .metrics import METRICS
+from .routing import StageRouter
 from .settings import (
     CACHE_SIZE,
     CLEANING_LIST,
     MAX_POSSIBLE_CANDIDATES,
     MAX_SEGMENT_LEN,
     MIN_SEGMENT_LEN,
+    URL_BATCH_SIZE,
+)
+from .trace import Trace
+from .utils import (
+    Extractor,
+    clean_html,
+    decode_file,
+    element_text,
+    fetch_head,
+    fetch_response,
+    is_url,
+    load_html,
+    mask_html,
+    normalize_headers,
+    trim_text,
 )
-from .utils import Extractor, clean_html, load_html, trim_text
 from .validators import (
     check_extracted_reference,
     compare_values,
+    convert_date,
     correct_year,
     filter_ymd_candidate,
     get_min_date,
@@ -73,6 +100,9 @@ from .validators import (
     validate_and_convert,
 )
 
+if TYPE_CHECKING:
+    from .cache import HTTPCache
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -81,6 +111,19 @@ def logstring(element: HtmlElement) -> str:
     return tostring(element, pretty_print=False, encoding="unicode").strip()
 
 
+class LazyElement:
+    """Defer the serialization of an element until the log record is
+    actually emitted, so that it costs nothing if debugging is off."""
+
+    __slots__ = ["element"]
+
+    def __init__(self, element: HtmlElement) -> None:
+        self.element = element
+
+    def __str__(self) -> str:
+        return logstring(self.element)
+
+
 DATE_ATTRIBUTES = {
     "analyticsattributes.articledate",
     "article.created",
@@ -220,15 +263,18 @@ def examine_date_elements(
     tree: HtmlElement,
     expression: str,
     options: Extractor,
+    elements: list[HtmlElement] | None = None,
 ) -> str | None:
-    """Check HTML elements one by one for date expressions"""
-    elements = tree.xpath(expression)
+    """Check HTML elements one by one for date expressions
+    (selected in the tree unless they are given)"""
+    if elements is None:
+        elements = tree.xpath(expression)
     if not elements or len(elements) > MAX_POSSIBLE_CANDIDATES:
         return None
 
     for elem in elements:
         # try element text and link title (Blogspot)
-        for text in [elem.text_content(), elem.get("title", "")]:
+        for text in [element_text(elem), elem.get("title", "")]:
             attempt = examine_text(text, options)
             if attempt:
                 return attempt
@@ -277,11 +323,11 @@ def examine_header(
                 reserve = extract_url_date(elem.get("content"), options)
             # date
             elif attribute in DATE_ATTRIBUTES:
-                LOGGER.debug("examining meta name: %s", logstring(elem))
+                LOGGER.debug("examining meta name: %s", LazyElement(elem))
                 headerdate = tryfunc(elem.get("content"))
             # modified
             elif attribute in NAME_MODIFIED:
-                LOGGER.debug("examining meta name: %s", logstring(elem))
+                LOGGER.debug("examining meta name: %s", LazyElement(elem))
                 if not options.original:
                     headerdate = tryfunc(elem.get("content"))
                 else:
@@ -290,7 +336,7 @@ def examine_header(
         elif "property" in elem.attrib:
             attribute = elem.get("property", "").lower()
             if attribute in DATE_ATTRIBUTES or attribute in PROPERTY_MODIFIED:
-                LOGGER.debug("examining meta property: %s", logstring(elem))
+                LOGGER.debug("examining meta property: %s", LazyElement(elem))
                 attempt = tryfunc(elem.get("content"))
                 if attempt is not None:
                     if (attribute in DATE_ATTRIBUTES and options.original) or (
@@ -305,7 +351,7 @@ def examine_header(
             attribute = elem.get("itemprop", "").lower()
             # original: store / updated: override date
             if attribute in ITEMPROP_ATTRS:
-                LOGGER.debug("examining meta itemprop: %s", logstring(elem))
+                LOGGER.debug("examining meta itemprop: %s", LazyElement(elem))
                 attempt = tryfunc(elem.get("datetime") or elem.get("content"))
                 # store value
                 if attempt is not None:
@@ -318,7 +364,7 @@ def examine_header(
                     #    reserve = attempt
             # reserve with copyrightyear
             elif attribute == "copyrightyear":
-                LOGGER.debug("examining meta itemprop: %s", logstring(elem))
+                LOGGER.debug("examining meta itemprop: %s", LazyElement(elem))
                 if "content" in elem.attrib:
                     attempt = "-".join([elem.get("content", ""), "01", "01"])
                     if is_valid_date(
@@ -328,19 +374,19 @@ def examine_header(
         # pubdate, relatively rare
         elif "pubdate" in elem.attrib:
             if elem.get("pubdate", "").lower() == "pubdate":
-                LOGGER.debug("examining meta pubdate: %s", logstring(elem))
+                LOGGER.debug("examining meta pubdate: %s", LazyElement(elem))
                 headerdate = tryfunc(elem.get("content"))
         # http-equiv, rare
         elif "http-equiv" in elem.attrib:
             attribute = elem.get("http-equiv", "").lower()
             if attribute == "date":
-                LOGGER.debug("examining meta http-equiv: %s", logstring(elem))
+                LOGGER.debug("examining meta http-equiv: %s", LazyElement(elem))
                 if options.original:
                     headerdate = tryfunc(elem.get("content"))
                 else:
                     reserve = tryfunc(elem.get("content"))
             elif attribute == "last-modified":
-                LOGGER.debug("examining meta http-equiv: %s", logstring(elem))
+                LOGGER.debug("examining meta http-equiv: %s", LazyElement(elem))
                 if not options.original:
                     headerdate = tryfunc(elem.get("content"))
                 else:
@@ -356,6 +402,52 @@ def examine_header(
     return headerdate
 
 
+def parse_http_date(value: str | None) -> datetime | None:
+    "Convert a HTTP date header value to a naive UTC datetime object."
+    if not value:
+        return None
+    try:
+        dateobject = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        LOGGER.debug("cannot parse HTTP date: %s", value)
+        return None
+    # "-0000" yields a naive datetime, other offsets are converted to UTC
+    if dateobject.tzinfo is not None:
+        dateobject = dateobject.astimezone(timezone.utc)
+    return dateobject.replace(tzinfo=None)
+
+
+def examine_http_headers(
+    headers: Mapping[str, str],
+    options: Extractor,
+) -> str | None:
+    """
+    Look for a trustworthy modification date in the HTTP response headers
+
+    :param headers:
+        Headers of the HTTP response (e.g. returned by fetch_response())
+    :type headers: dictionary
+    :param options:
+        Options for extraction
+    :type options: Extractor
+    :return: Returns a valid date expression as a string, or None
+
+    """
+    headers = normalize_headers(headers)
+    last_modified = parse_http_date(headers.get("last-modified"))
+    if last_modified is None:
+        return None
+    # dynamic pages are stamped with the time of the response
+    response_date = parse_http_date(headers.get("date"))
+    if response_date is not None and last_modified >= response_date:
+        LOGGER.debug("discarding last-modified header: %s", last_modified)
+        return None
+    LOGGER.debug("last-modified header found: %s", last_modified)
+    return validate_and_convert(
+        last_modified, options.format, earliest=options.min, latest=options.max
+    )
+
+
 def select_candidate(
     occurrences: Counter[str],
     catch: re.Pattern[str],
@@ -421,6 +513,7 @@ def search_pattern(
         yearpat=yearpat,
         earliest=options.min,
         latest=options.max,
+        guarded=options.guarded,
     )
     return select_candidate(candidates, catch, yearpat, options)
 
@@ -445,6 +538,7 @@ def examine_abbr_elements(
     options: Extractor,
 ) -> str | None:
     """Scan the page for abbr elements and check if their content contains an eligible date"""
+    debug = LOGGER.isEnabledFor(logging.DEBUG)
     elements = tree.findall(".//abbr")
     if 0 < len(elements) < MAX_POSSIBLE_CANDIDATES:
         reference = 0
@@ -455,7 +549,8 @@ def examine_abbr_elements(
                     candidate = int(elem.get("data-utime", ""))
                 except ValueError:
                     continue
-                LOGGER.debug("data-utime found: %s", candidate)
+                if debug:
+                    LOGGER.debug("data-utime found: %s", candidate)
                 # look for original date
                 if options.original and (reference == 0 or candidate < reference):
                     reference = candidate
@@ -467,7 +562,8 @@ def examine_abbr_elements(
                 # other attributes
                 if "title" in elem.attrib:
                     trytext = elem.get("title")
-                    LOGGER.debug("abbr published-title found: %s", trytext)
+                    if debug:
+                        LOGGER.debug("abbr published-title found: %s", trytext)
                     # shortcut
                     if options.original:
                         attempt = try_date_expr(
@@ -486,7 +582,8 @@ def examine_abbr_elements(
                             break
                 # dates, not times of the day
                 elif elem.text and len(elem.text) > 10:
-                    LOGGER.debug("abbr published found: %s", elem.text)
+                    if debug:
+                        LOGGER.debug("abbr published found: %s", elem.text)
                     reference = compare_reference(reference, elem.text, options)
         # return or try rescue in abbr content
         return check_extracted_reference(reference, options) or examine_date_elements(
@@ -502,6 +599,7 @@ def examine_time_elements(
     options: Extractor,
 ) -> str | None:
     """Scan the page for time elements and check if their content contains an eligible date"""
+    debug = LOGGER.isEnabledFor(logging.DEBUG)
     elements = tree.findall(".//time")
     if 0 < len(elements) < MAX_POSSIBLE_CANDIDATES:
         # scan all the tags and look for the newest one
@@ -518,7 +616,10 @@ def examine_time_elements(
                     and options.original
                 ):
                     shortcut_flag = True
-                    LOGGER.debug("shortcut for time pubdate found: %s", datetime_attr)
+                    if debug:
+                        LOGGER.debug(
+                            "shortcut for time pubdate found: %s", datetime_attr
+                        )
                 # shortcuts: class attribute
                 elif "class" in elem.attrib:
                     class_attr = elem.get("class", "")
@@ -527,18 +628,20 @@ def examine_time_elements(
                         or class_attr.startswith("entry-time")
                     ):
                         shortcut_flag = True
-                        LOGGER.debug(
-                            "shortcut for time/datetime found: %s", datetime_attr
-                        )
+                        if debug:
+                            LOGGER.debug(
+                                "shortcut for time/datetime found: %s", datetime_attr
+                            )
                     # updated time
                     elif not options.original and class_attr == "updated":
                         shortcut_flag = True
-                        LOGGER.debug(
-                            "shortcut for updated time/datetime found: %s",
-                            datetime_attr,
-                        )
+                        if debug:
+                            LOGGER.debug(
+                                "shortcut for updated time/datetime found: %s",
+                                datetime_attr,
+                            )
                 # datetime attribute
-                else:
+                elif debug:
                     LOGGER.debug("time/datetime found: %s", datetime_attr)
                 # analyze attribute
                 if shortcut_flag:
@@ -555,7 +658,8 @@ def examine_time_elements(
                     reference = compare_reference(reference, datetime_attr, options)
             # bare text in element
             elif elem.text is not None and len(elem.text) > 6:
-                LOGGER.debug("time/datetime found in text: %s", elem.text)
+                if debug:
+                    LOGGER.debug("time/datetime found in text: %s", elem.text)
                 reference = compare_reference(reference, elem.text, options)
             # else...?
         # return
@@ -598,6 +702,7 @@ def search_normalized(
         earliest=options.min,
         latest=options.max,
         incomplete=incomplete,
+        guarded=options.guarded,
     )
     # revert DD-MM-YYYY patterns before sorting
     normalized = Counter(
@@ -748,7 +853,7 @@ def search_page(htmlstring: str, options: Extractor) -> str | None:
         return result
 
     # try full-blown text regex on all HTML?
-    text_date = regex_parse(htmlstring)
+    text_date = regex_parse(htmlstring, options.guarded)
     # todo: find all candidates and disambiguate?
     if copyear == 0 or (text_date and text_date.year >= copyear):
         result = validate_and_convert(
@@ -788,8 +893,304 @@ def search_page(htmlstring: str, options: Extractor) -> str | None:
     return None
 
 
-def find_date(
+def get_canonical_url(tree: HtmlElement) -> str | None:
+    "Probe the document for a canonical link and return its target."
+    urlelem = tree.find('.//link[@rel="canonical"]')
+    return urlelem.get("href") if urlelem is not None else None
+
+
+def free_text_segments(tree: HtmlElement) -> list[str]:
+    "Collect the text segments of the page short enough to be a date."
+    return [
+        segment
+        for segment in map(str.strip, FREE_TEXT_EXPRESSIONS(tree))
+        if MIN_SEGMENT_LEN < len(segment) < MAX_SEGMENT_LEN
+    ]
+
+
+def examine_free_text(
+    tree: HtmlElement,
+    options: Extractor,
+    segments: list[str] | None = None,
+) -> str | None:
+    """Look for date expressions in short text segments throughout the page
+    (collected from the tree unless they are given)"""
+    LOGGER.debug("extensive search started")
+    # TODO: further tests & decide according to original_date
+    reference = 0
+    for segment in segments if segments is not None else free_text_segments(tree):
+        reference = compare_reference(reference, segment, options)
+    return check_extracted_reference(reference, options)
+
+
+class DocumentContext:
+    """Parsed document along with the artifacts derived from it during
+    extraction: canonical URL, content management system, pruned tree and
+    the elements selected in it, string version and text segments. Each one is only computed when an
+    extraction step needs it and then kept, so that a context can be
+    passed to find_date() several times, e.g. with different options.
+    The pruned tree is built on a copy of the tree unless copy_tree is
+    False, which is only safe if the tree is not used any more after
+    pruning (single pass through the extraction steps in standard order)."""
+
+    __slots__ = [
+        "_cms",
+        "_elements",
+        "_htmlstring",
+        "_search_tree",
+        "_segments",
+        "_url",
+        "copy_tree",
+        "source",
+        "tree",
+    ]
+
+    def __init__(
+        self,
+        tree: HtmlElement,
+        url: str | None = None,
+        copy_tree: bool = True,
+        source: str | None = None,
+    ) -> None:
+        self._cms: str | None | bool = False
+        self._elements: dict[str, list[HtmlElement]] = {}
+        self._htmlstring: str | None = None
+        self._search_tree: HtmlElement | None = None
+        self._segments: list[str] | None = None
+        self._url: str | None | bool = url or False
+        # cleaning the tree in place avoids a costly deepcopy of the whole
+        # document but leaves the context unusable for further extractions
+        self.copy_tree = copy_tree
+        # decoded input document, searched instead of the serialized tree
+        self.source = source
+        self.tree = tree
+
+    @property
+    def url(self) -> str | None:
+        "URL given for the document or its canonical link."
+        if self._url is False:
+            self._url = get_canonical_url(self.tree)
+        return self._url  # type: ignore[return-value]
+
+    @property
+    def cms(self) -> str | None:
+        "Content management system detected in the document."
+        if self._cms is False:
+            self._cms = detect_cms(self.tree)
+        return self._cms  # type: ignore[return-value]
+
+    @property
+    def search_tree(self) -> HtmlElement:
+        "Pruned tree, stripped of unwanted elements."
+        if self._search_tree is None:
+            pruning_tree = deepcopy(self.tree) if self.copy_tree else self.tree
+            try:
+                self._search_tree = discard_unwanted(
+                    clean_html(pruning_tree, CLEANING_LIST)
+                )
+            # rare LXML error: no NULL bytes or control characters
+            except ValueError:  # pragma: no cover
+                self._search_tree = self.tree
+                LOGGER.error("lxml cleaner error")
+        return self._search_tree
+
+    @property
+    def htmlstring(self) -> str:
+        """Pruned document as a string: the source with the cleaned elements
+        skipped and the character references decoded if available (see
+        mask_html()), the serialized tree otherwise."""
+        if self._htmlstring is None:
+            # the discarded Wayback Machine toolbar cannot be located in the source
+            if self.source is not None and "wm-ipp" not in self.source:
+                self._htmlstring = mask_html(self.source)
+                return self._htmlstring
+            # robust conversion to string
+            try:
+                self._htmlstring = tostring(
+                    self.search_tree, pretty_print=False, encoding="unicode"
+                )
+            except UnicodeDecodeError:
+                self._htmlstring = tostring(
+                    self.search_tree, pretty_print=False
+                ).decode("utf-8", "ignore")
+        return self._htmlstring
+
+    def select(self, expression: str) -> list[HtmlElement]:
+        "Elements of the pruned tree matching an XPath expression."
+        if expression not in self._elements:
+            self._elements[expression] = self.search_tree.xpath(expression)
+        return self._elements[expression]
+
+    @property
+    def segments(self) -> list[str]:
+        "Short text segments of the pruned tree (see free_text_segments())."
+        if self._segments is None:
+            self._segments = free_text_segments(self.search_tree)
+        return self._segments
+
+
+def load_context(
     htmlobject: bytes | str | HtmlElement,
+    url: str | None = None,
+    copy_tree: bool = True,
+) -> DocumentContext | None:
+    """Parse a document (string, bytes, tree or URL) and return its context,
+    or None if it cannot be processed as HTML. Setting copy_tree to False
+    allows for pruning a parsed document in place if the context is used
+    once with the standard order of the extraction steps, a tree passed
+    as input is always copied."""
+    # keep the decoded document to search it without serializing the tree
+    source = None
+    if isinstance(htmlobject, (bytes, str)) and not is_url(htmlobject):
+        htmlobject = source = decode_file(htmlobject)
+    tree = load_html(htmlobject)
+    if tree is None:
+        return None
+    return DocumentContext(
+        tree,
+        url,
+        copy_tree=copy_tree or isinstance(htmlobject, HtmlElement),
+        source=source,
+    )
+
+
+# expressions for date elements with extensive search or not
+DATE_ELEMENTS = {
+    True: SLOW_PREPEND + DATE_EXPRESSIONS,
+    False: FAST_PREPEND + DATE_EXPRESSIONS,
+}
+# extraction steps in their standard order
+STAGES: dict[str, Callable[[DocumentContext, Extractor], str | None]] = {
+    # direct processing of URL info
+    "url": lambda state, options: extract_url_date(state.url, options),
+    # header, then JSON data
+    "header": lambda state, options: examine_header(state.tree, options),
+    "json": lambda state, options: json_search(state.tree, options),
+    "state": lambda state, options: state_search(state.tree, options),
+    "abbr": lambda state, options: examine_abbr_elements(state.tree, options),
+    # known locations for the detected CMS
+    "cms": lambda state, options: cms_search(state.tree, state.cms, options),
+    # expressions on the pruned tree
+    "date_elements": lambda state, options: examine_date_elements(
+        state.search_tree,
+        DATE_ELEMENTS[options.extensive],
+        options,
+        state.select(DATE_ELEMENTS[options.extensive]),
+    ),
+    "title": lambda state, options: examine_date_elements(
+        state.search_tree, ".//title|.//h1", options, state.select(".//title|.//h1")
+    ),
+    "time": lambda state, options: examine_time_elements(state.search_tree, options),
+    # date regex timestamp rescue, image elements and idiosyncrasies
+    "timestamp": lambda state, options: pattern_search(
+        state.htmlstring, TIMESTAMP_PATTERN, options
+    ),
+    "img": lambda state, options: img_search(state.search_tree, options),
+    "idiosyncrasies": lambda state, options: idiosyncrasies_search(
+        state.htmlstring, options
+    ),
+    # last resort: free text and search on page HTML
+    "free_text": lambda state, options: examine_free_text(
+        state.search_tree, options, state.segments
+    ),
+    "search_page": lambda state, options: search_page(state.htmlstring, options),
+}
+HEAD_STAGES = ("url", "header", "json")
+EXTENSIVE_STAGES = ("free_text", "search_page")
+
+
+def stage_order(
+    options: Extractor,
+    deferred_url_extractor: bool = False,
+    stages: tuple[str, ...] = tuple(STAGES),
+) -> list[str]:
+    "Return the extraction steps to run in their order of preference."
+    order = [s for s in stages if options.extensive or s not in EXTENSIVE_STAGES]
+    # use URL extractor as backup only (may be moved even further down)
+    if deferred_url_extractor and "url" in order:
+        order.remove("url")
+        order.insert(order.index("json") + 1 if "json" in order else 0, "url")
+    return order
+
+
+def run_stages(
+    state: DocumentContext,
+    options: Extractor,
+    deferred_url_extractor: bool = False,
+    router: StageRouter | None = None,
+    source_url: str | None = None,
+    stages: tuple[str, ...] = tuple(STAGES),
+    trace: Trace | None = None,
+) -> str | None:
+    """Run the extraction steps in order and return the first result.
+    If a router is given, start with the step learned for this website
+    and record the successful one, the extensive steps staying last. If a trace is given or if metrics are
+    enabled, record the outcome and duration of each step."""
+    order = stage_order(options, deferred_url_extractor, stages)
+    domain_url = state.url or source_url
+    if router is not None:
+        first = router.get(domain_url)
+        if first in order and first not in EXTENSIVE_STAGES:
+            order.remove(first)
+            order.insert(0, first)
+    timed = trace is not None or METRICS.enabled
+    for stage in order:
+        start = perf_counter() if timed else 0.0
+        result = STAGES[stage](state, options)
+        if timed:
+            duration = perf_counter() - start
+            if trace is not None:
+                trace.add(stage, result, duration)
+            if METRICS.enabled:
+                METRICS.observe(stage, result, duration)
+        if result is not None:
+            LOGGER.debug("date found by extraction step: %s", stage)
+            if router is not None and stage not in EXTENSIVE_STAGES:
+                router.record(domain_url, stage)
+            return result
+    return None
+
+
+@dataclass(slots=True)
+class Candidate:
+    """Defines a class to store a date found in a document: extraction step
+    which found it first, score (1.0 for the preferred step, decreasing
+    with its rank) and all the steps which found it."""
+
+    date: str
+    source: str
+    score: float
+    sources: tuple[str, ...] = ()
+
+
+def collect_candidates(
+    state: DocumentContext,
+    options: Extractor,
+    deferred_url_extractor: bool = False,
+    http_date: str | None = None,
+) -> list[Candidate]:
+    """Run all extraction steps and return the dates found, the first one
+    being the result of run_stages(). A date found in the HTTP headers
+    comes first when looking for the updated date, last otherwise."""
+    order = stage_order(options, deferred_url_extractor)
+    if http_date is not None:
+        order.insert(len(order) if options.original else 0, "http_headers")
+    found: dict[str, list[str]] = {}
+    for stage in order:
+        result = http_date if stage == "http_headers" else STAGES[stage](state, options)
+        if result is not None:
+            found.setdefault(result, []).append(stage)
+    # dictionaries preserve insertion order, i.e. the order of preference
+    return [
+        Candidate(
+            date, stages[0], 1 - order.index(stages[0]) / len(order), tuple(stages)
+        )
+        for date, stages in found.items()
+    ]
+
+
+def find_date(
+    htmlobject: bytes | str | HtmlElement | DocumentContext,
     extensive_search: bool = True,
     original_date: bool = False,
     outputformat: str = "%Y-%m-%d",
@@ -798,14 +1199,22 @@ def find_date(
     min_date: datetime | str | None = None,
     max_date: datetime | str | None = None,
     deferred_url_extractor: bool = False,
+    head_probe: bool = False,
+    headers: Mapping[str, str] | None = None,
+    http_cache: "HTTPCache | None" = None,
+    router: StageRouter | None = None,
+    trace: Trace | None = None,
+    guarded_scan: bool = False,
 ) -> str | None:
     """
     Extract dates from HTML documents using markup analysis and text patterns
 
     :param htmlobject:
-        Two possibilities: 1. HTML document (e.g. body of HTTP request or .html-file) in text string
-        form or LXML parsed tree or 2. URL string (gets detected automatically)
-    :type htmlobject: string or lxml tree
+        Three possibilities: 1. HTML document (e.g. body of HTTP request or .html-file) in text string
+        form or LXML parsed tree, 2. URL string (gets detected automatically) or
+        3. DocumentContext (see load_context()) to re-use a parsed document and
+        the artifacts derived from it across calls (its URL takes precedence)
+    :type htmlobject: string, lxml tree or DocumentContext
     :param extensive_search:
         Activate pattern-based opportunistic text search
     :type extensive_search: boolean
@@ -822,7 +1231,8 @@ def find_date(
         (in some cases much faster)
     :type url: string
     :param verbose:
-        Set verbosity level for debugging
+        Set verbosity level for debugging (configures logging for the
+        whole process, see trace for a per-call alternative)
     :type verbose: boolean
     :param min_date:
         Set the earliest acceptable date manually (ISO 8601 YMD format)
@@ -834,6 +1244,34 @@ def find_date(
         Use url extractor as backup only to prioritize full expressions,
         e.g. of the type `%Y-%m-%d %H:%M:%S`
     :type deferred_url_extractor: boolean
+    :param head_probe:
+        If a URL is given, only download the beginning of the document first
+        (HTTP range request) and fetch the rest if no date is found there,
+        not used along with http_cache which requires the whole document
+    :type head_probe: boolean
+    :param headers:
+        Provide the headers of the HTTP response (see fetch_response()): a
+        trustworthy Last-Modified header is used directly to find the most
+        recent date or as a last resort to find the original date
+    :type headers: dictionary
+    :param http_cache:
+        If a URL is given, use conditional requests and re-use the date
+        stored in the cache if the document has not been modified, the
+        headers of the response are used as with the headers parameter
+    :type http_cache: HTTPCache
+    :param router:
+        Learn which extraction step finds the date on each website
+        and try it first on further documents from the same domain
+    :type router: StageRouter
+    :param trace:
+        Record the extraction steps tried for this document, their result
+        and duration, without changing the logging configuration
+    :type trace: Trace
+    :param guarded_scan:
+        Search the text patterns in bounded windows of the document so that
+        the processing time of pathological inputs remains bounded
+        (dates spread over window boundaries may be missed)
+    :type guarded_scan: boolean
     :return: Returns a valid date expression as a string, or None
     """
 
@@ -841,14 +1279,59 @@ def find_date(
     if verbose:
         logging.basicConfig(level=logging.DEBUG)
 
-    tree = load_html(htmlobject)
-
-    # safeguards
-    if tree is None:
-        return None
+    # safeguard
     if outputformat != "%Y-%m-%d" and not is_valid_format(outputformat):
         return None
 
+    # recrawl: conditional request, no processing if the page hasn't changed
+    if http_cache is not None and is_url(htmlobject):
+        key = repr(
+            (
+                extensive_search,
+                original_date,
+                outputformat,
+                url,
+                str(min_date),
+                str(max_date),
+                deferred_url_extractor,
+            )
+        )
+        # conditional request only if there is a date to re-use
+        found, cached_date = http_cache.lookup(htmlobject, key)
+        response = fetch_response(
+            htmlobject,
+            headers=http_cache.conditional_headers(htmlobject) if found else None,
+        )
+        if found and response is not None and response.status == 304:
+            LOGGER.debug("not modified, using cached date: %s", htmlobject)
+            if trace is not None:
+                trace.add("http_cache", cached_date)
+                trace.result = cached_date
+            return cached_date
+        if response is None:
+            raise ValueError(f"URL couldn't be processed: {htmlobject}")
+        result = find_date(
+            response.data,
+            extensive_search=extensive_search,
+            original_date=original_date,
+            outputformat=outputformat,
+            url=url,
+            verbose=verbose,
+            min_date=min_date,
+            max_date=max_date,
+            deferred_url_extractor=deferred_url_extractor,
+            # headers passed by the caller override the ones of the response
+            headers={
+                **normalize_headers(response.headers),
+                **normalize_headers(headers or {}),
+            },
+            router=router,
+            trace=trace,
+            guarded_scan=guarded_scan,
+        )
+        http_cache.store(htmlobject, response.headers, key, result)
+        return result
+
     # define options and time boundaries
     options = Extractor(
         extensive_search,
@@ -856,103 +1339,394 @@ def find_date(
         get_min_date(min_date),
         original_date,
         outputformat,
+        guarded_scan,
     )
 
-    # URL
-    if url is None:
-        # probe for canonical links
-        urlelem = tree.find('.//link[@rel="canonical"]')
-        if urlelem is not None:
-            url = urlelem.get("href")
+    # HTTP headers: answer without parsing or store as reserve
+    http_date = examine_http_headers(headers, options) if headers else None
+    if trace is not None and headers:
+        trace.add("http_headers", http_date)
+    if http_date is not None and not original_date:
+        if trace is not None:
+            trace.result = http_date
+        return http_date
+
+    # the downloaded page may help identifying the website
+    source_url = htmlobject if is_url(htmlobject) else None
+
+    # partial download: look for a date in the document head first
+    context = htmlobject if isinstance(htmlobject, DocumentContext) else None
+    if head_probe and is_url(htmlobject):
+        prefix, complete = fetch_head(htmlobject)
+        if prefix:
+            context = load_context(prefix, url, copy_tree=router is not None)
+            if context is not None:
+                result = run_stages(
+                    context,
+                    options,
+                    router=router,
+                    source_url=source_url,
+                    # deferred URL extraction requires the whole document
+                    stages=HEAD_STAGES[1:] if deferred_url_extractor else HEAD_STAGES,
+                    trace=trace,
+                )
+                if result is not None:
+                    if trace is not None:
+                        trace.result = result
+                    return result
+            # no need to download or parse the document twice
+            if complete:
+                htmlobject = prefix
+            else:
+                context = None
+
+    if context is None and not isinstance(htmlobject, DocumentContext):
+        # learned routes change the order of the extraction steps
+        context = load_context(htmlobject, url, copy_tree=router is not None)
+
+    # safeguard
+    if context is None:
+        if trace is not None:
+            trace.result = http_date
+        return http_date
+
+    result = run_stages(
+        context, options, deferred_url_extractor, router, source_url, trace=trace
+    )
+    if result is None:
+        result = http_date
+    if trace is not None:
+        trace.result = result
+    return result
+
+
+def find_dates(
+    htmlobject: bytes | str | HtmlElement | DocumentContext,
+    variants: Sequence[Mapping[str, Any]],
+    **kwargs: Any,
+) -> list[str | None]:
+    """
+    Extract dates with several sets of options from a single parse of the
+    document, sharing the pruned tree, the selected elements, the string
+    version and the parsing caches
 
-    # direct processing of URL info
-    url_result = extract_url_date(url, options)
-    if url_result is not None and not deferred_url_extractor:
-        return url_result
+    :param htmlobject:
+        Same as in find_date()
+    :type htmlobject: string, lxml tree or DocumentContext
+    :param variants:
+        Options specific to each extraction, e.g.
+        [{"original_date": True}, {"original_date": False}]
+    :type variants: list of dictionaries
+    :param kwargs:
+        Options of find_date() common to all extractions
+    :return: Returns a list with one result per set of options, in order
 
-    # first try header
-    # then try to use JSON data
-    result = examine_header(tree, options) or json_search(tree, options)
-    if result is not None:
-        return result
+    """
+    context: DocumentContext | None
+    if isinstance(htmlobject, DocumentContext):
+        context = htmlobject
+    # conditional requests and partial downloads are handled by find_date()
+    elif is_url(htmlobject) and (kwargs.get("http_cache") or kwargs.get("head_probe")):
+        context = None
+    else:
+        context = load_context(htmlobject, kwargs.get("url"))
+    # documents which cannot be parsed may still have dates in HTTP headers
+    return [
+        find_date(context or htmlobject, **{**kwargs, **variant})
+        for variant in variants
+    ]
 
-    # deferred processing of URL info (may be moved even further down if necessary)
-    if deferred_url_extractor and url_result is not None:
-        return url_result
 
-    # try abbr elements
-    abbr_result = examine_abbr_elements(
-        tree,
-        options,
+def find_date_candidates(
+    htmlobject: bytes | str | HtmlElement | DocumentContext,
+    extensive_search: bool = True,
+    original_date: bool = False,
+    outputformat: str = "%Y-%m-%d",
+    url: str | None = None,
+    min_date: datetime | str | None = None,
+    max_date: datetime | str | None = None,
+    deferred_url_extractor: bool = False,
+    headers: Mapping[str, str] | None = None,
+    guarded_scan: bool = False,
+) -> list[Candidate]:
+    """
+    Run all extraction steps on a document and return the valid dates found,
+    in the order of preference of find_date(), so that they can be re-ranked
+    without further extraction. The parameters are the same as in find_date(),
+    the dates being validated against min_date and max_date: wider boundaries
+    can be used to filter the candidates afterwards.
+
+    :param htmlobject:
+        Same as in find_date()
+    :type htmlobject: string, lxml tree or DocumentContext
+    :return: Returns a list of candidates (date, step which found it first,
+        score and all steps which found it), the first one being the result
+        of find_date() with the same options
+
+    """
+    if outputformat != "%Y-%m-%d" and not is_valid_format(outputformat):
+        return []
+    options = Extractor(
+        extensive_search,
+        get_max_date(max_date),
+        get_min_date(min_date),
+        original_date,
+        outputformat,
+        guarded_scan,
     )
-    if abbr_result is not None:
-        return abbr_result
-
-    # first, prune tree
-    # only copy the tree if the caller passed one in: when we parsed it ourselves
-    # (string/bytes/URL input) we own it and can clean it in place, avoiding a
-    # costly deepcopy of the whole document
-    pruning_tree = deepcopy(tree) if isinstance(htmlobject, HtmlElement) else tree
-    try:
-        search_tree = discard_unwanted(clean_html(pruning_tree, CLEANING_LIST))
-    # rare LXML error: no NULL bytes or control characters
-    except ValueError:  # pragma: no cover
-        search_tree = tree
-        LOGGER.error("lxml cleaner error")
-
-    # define expressions + text_content
-    if extensive_search:
-        date_expr = SLOW_PREPEND + DATE_EXPRESSIONS
-    else:
-        date_expr = FAST_PREPEND + DATE_EXPRESSIONS
-
-    # then look for expressions
-    # and try time elements
-    result = (
-        examine_date_elements(
-            search_tree,
-            date_expr,
-            options,
+    http_date = examine_http_headers(headers, options) if headers else None
+    context = (
+        htmlobject
+        if isinstance(htmlobject, DocumentContext)
+        else load_context(htmlobject, url, copy_tree=False)
+    )
+    if context is None:
+        return (
+            [Candidate(http_date, "http_headers", 1.0, ("http_headers",))]
+            if http_date
+            else []
         )
-        or examine_date_elements(
-            search_tree,
-            ".//title|.//h1",
-            options,
+    return collect_candidates(context, options, deferred_url_extractor, http_date)
+
+
+def find_date_in_text(
+    text: str,
+    extensive_search: bool = True,
+    original_date: bool = False,
+    outputformat: str = "%Y-%m-%d",
+    min_date: datetime | str | None = None,
+    max_date: datetime | str | None = None,
+    guarded_scan: bool = False,
+) -> str | None:
+    """
+    Extract a date from plain text (e.g. a byline, a description or the text
+    of an article) without parsing it as HTML. The parameters are the same
+    as in find_date().
+
+    :param text:
+        Text to search, a short string is first parsed as a date expression
+    :type text: string
+    :return: Returns a valid date expression as a string, or None
+
+    """
+    if not text or (outputformat != "%Y-%m-%d" and not is_valid_format(outputformat)):
+        return None
+    options = Extractor(
+        extensive_search,
+        get_max_date(max_date),
+        get_min_date(min_date),
+        original_date,
+        outputformat,
+        guarded_scan,
+    )
+    # short text: date expression
+    if len(text) <= MAX_SEGMENT_LEN:
+        result = try_date_expr(
+            text, options.format, options.extensive, options.min, options.max
         )
-        or examine_time_elements(search_tree, options)
+        if result is not None:
+            return result
+    # timestamps and author-written dates
+    result = pattern_search(text, TIMESTAMP_PATTERN, options) or idiosyncrasies_search(
+        text, options
     )
     if result is not None:
         return result
-
-    # robust conversion to string
-    try:
-        htmlstring = tostring(search_tree, pretty_print=False, encoding="unicode")
-    except UnicodeDecodeError:
-        htmlstring = tostring(search_tree, pretty_print=False).decode("utf-8", "ignore")
-
-    # date regex timestamp rescue
-    # try image elements
-    # precise patterns and idiosyncrasies
-    result = (
-        pattern_search(htmlstring, TIMESTAMP_PATTERN, options)
-        or img_search(search_tree, options)
-        or idiosyncrasies_search(htmlstring, options)
+    # dates written out in full
+    result = validate_and_convert(
+        regex_parse(text, options.guarded),
+        options.format,
+        earliest=options.min,
+        latest=options.max,
     )
-    if result is not None:
+    if result is not None or not options.extensive:
         return result
+    # last resort: patterns searched throughout the page, which expect
+    # a non-digit character around the dates as supplied by the markup
+    return search_page(f" {text} ", options)
 
-    # last resort
-    if extensive_search:
-        LOGGER.debug("extensive search started")
-        # TODO: further tests & decide according to original_date
-        reference = 0
-        for segment in FREE_TEXT_EXPRESSIONS(search_tree):
-            segment = segment.strip()
-            if not MIN_SEGMENT_LEN < len(segment) < MAX_SEGMENT_LEN:
-                continue
-            reference = compare_reference(reference, segment, options)
-        converted = check_extracted_reference(reference, options)
-        # return or search page HTML
-        return converted or search_page(htmlstring, options)
 
+def find_dates_from_urls(
+    urls: Iterable[str],
+    extensive_search: bool = True,
+    outputformat: str = "%Y-%m-%d",
+    min_date: datetime | str | None = None,
+    max_date: datetime | str | None = None,
+) -> list[str | None]:
+    """
+    Extract dates from URLs alone, without downloading the documents.
+    The URLs are processed in batches sharing the regex and validation work.
+
+    :param urls:
+        URLs to search, e.g. the lines of a file
+    :type urls: iterable of strings
+    :param extensive_search:
+        Also accept URLs containing only a year and a month (/2021/03/)
+    :type extensive_search: boolean
+    :return: Returns a list with one result per URL (a date string or None)
+
+    """
+    urls = iter(urls)
+    if outputformat != "%Y-%m-%d" and not is_valid_format(outputformat):
+        return [None for _ in urls]
+    options = Extractor(
+        extensive_search,
+        get_max_date(max_date),
+        get_min_date(min_date),
+        False,
+        outputformat,
+    )
+    results: list[str | None] = []
+    while batch := list(islice(urls, URL_BATCH_SIZE)):
+        results.extend(extract_url_dates(batch, options))
+    return results
+
+
+@dataclass(slots=True)
+class DateField:
+    """Defines a class to store a date-bearing field of a document: its name
+    (e.g. "article:modified_time"), the kind of markup ("name", "property",
+    "itemprop", "http-equiv", "pubdate", "time" or "abbr"), the kind of date
+    ("published", "modified", "copyright", "url" or "date" if unspecified),
+    the raw value and the parsed date (None if it is not valid)."""
+
+    name: str
+    markup: str
+    kind: str
+    value: str
+    date: str | None
+
+
+def classify_field(elem: HtmlElement) -> tuple[str, str, str, str | None] | None:
+    """Recognize a date-bearing element and return its name, its markup,
+    the kind of date and its raw value, using the same lists of attributes
+    as the extraction steps."""
+    if elem.tag == "meta" and "name" in elem.attrib:
+        name = elem.get("name", "").lower()
+        if name == "og:url":
+            return name, "name", "url", elem.get("content")
+        if name in DATE_ATTRIBUTES:
+            return name, "name", "published", elem.get("content")
+        if name in NAME_MODIFIED:
+            return name, "name", "modified", elem.get("content")
+    if "itemprop" in elem.attrib:
+        name = elem.get("itemprop", "").lower()
+        if name in ITEMPROP_ATTRS:
+            kind = "published" if name in ITEMPROP_ATTRS_ORIGINAL else "modified"
+            value = elem.get("datetime") or elem.get("content")
+            if value is None and elem.tag != "meta":
+                value = element_text(elem)
+            return name, "itemprop", kind, value
+        if name == "copyrightyear":
+            return name, "itemprop", "copyright", elem.get("content") or elem.text
+    # RDFa and Open Graph, on meta and other elements
+    if "property" in elem.attrib:
+        name = elem.get("property", "").lower()
+        if name in DATE_ATTRIBUTES or name in PROPERTY_MODIFIED:
+            kind = "published" if name in DATE_ATTRIBUTES else "modified"
+            value = elem.get("content") or elem.get("datetime")
+            if value is None and elem.tag != "meta":
+                value = element_text(elem)
+            return name, "property", kind, value
+    if elem.tag == "meta":
+        if elem.get("pubdate", "").lower() == "pubdate":
+            return "pubdate", "pubdate", "published", elem.get("content")
+        name = elem.get("http-equiv", "").lower()
+        if name in ("date", "last-modified"):
+            kind = "published" if name == "date" else "modified"
+            return name, "http-equiv", kind, elem.get("content")
+    elif elem.tag == "time":
+        datetime_attr = elem.get("datetime", "")
+        class_attr = elem.get("class", "")
+        if elem.get("pubdate") == "pubdate" or class_attr.startswith(
+            ("entry-date", "entry-time")
+        ):
+            kind = "published"
+        elif class_attr == "updated":
+            kind = "modified"
+        else:
+            kind = "date"
+        if len(datetime_attr) > 6:
+            return "datetime", "time", kind, datetime_attr
+        return "text", "time", kind, elem.text
+    elif elem.tag == "abbr":
+        if "data-utime" in elem.attrib:
+            return "data-utime", "abbr", "date", elem.get("data-utime")
+        if elem.get("class") in CLASS_ATTRS:
+            if "title" in elem.attrib:
+                return "title", "abbr", "published", elem.get("title")
+            return "text", "abbr", "published", elem.text
     return None
+
+
+def extract_date_metadata(
+    htmlobject: bytes | str | HtmlElement | DocumentContext,
+    extensive_search: bool = True,
+    outputformat: str = "%Y-%m-%d",
+    min_date: datetime | str | None = None,
+    max_date: datetime | str | None = None,
+) -> list[DateField]:
+    """
+    Collect all date-bearing fields of a document in a single pass over the
+    tree: meta elements (e.g. Open Graph, Dublin Core or http-equiv),
+    microdata and RDFa attributes, time and abbr elements.
+    The fields are returned in document order with their parsed dates,
+    the choice among them is left to the caller.
+
+    :param htmlobject:
+        Same as in find_date()
+    :type htmlobject: string, lxml tree or DocumentContext
+    :param extensive_search, outputformat, min_date, max_date:
+        Options used to parse the dates, same as in find_date()
+    :return: Returns a list of DateField objects
+
+    """
+    if outputformat != "%Y-%m-%d" and not is_valid_format(outputformat):
+        return []
+    context = (
+        htmlobject
+        if isinstance(htmlobject, DocumentContext)
+        else load_context(htmlobject)
+    )
+    if context is None:
+        return []
+    options = Extractor(
+        extensive_search,
+        get_max_date(max_date),
+        get_min_date(min_date),
+        False,
+        outputformat,
+    )
+    fields = []
+    for elem in METADATA_EXPRESSION(context.tree):
+        field = classify_field(elem)
+        if field is None:
+            continue
+        name, markup, kind, value = field
+        if not value or not value.strip():
+            continue
+        if kind == "url":
+            date = extract_url_date(value, options)
+        elif kind == "copyright":
+            attempt = f"{value.strip()}-01-01"
+            date = (
+                convert_date(attempt, "%Y-%m-%d", options.format)
+                if is_valid_date(
+                    attempt, "%Y-%m-%d", earliest=options.min, latest=options.max
+                )
+                else None
+            )
+        elif name == "data-utime":
+            date = (
+                check_extracted_reference(int(value), options)
+                if value.isdigit()
+                else None
+            )
+        else:
+            date = try_date_expr(
+                value, options.format, options.extensive, options.min, options.max
+            )
+        fields.append(DateField(name, markup, kind, value, date))
+        if len(fields) >= MAX_POSSIBLE_CANDIDATES:
+            break
+    return fields
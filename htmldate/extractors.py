@@ -6,8 +6,13 @@ Custom parsers and XPath expressions for date extraction
 import logging
 import re
 
-from datetime import datetime
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
 from functools import lru_cache
+from itertools import accumulate
+from typing import Any
 
 # coverage for date parsing
 from dateparser import DateDataParser  # type: ignore[attr-defined]  # third-party, slow
@@ -18,8 +23,21 @@ from lxml.etree import XPath
 from lxml.html import HtmlElement
 
 # own
-from .settings import CACHE_SIZE, MAX_SEGMENT_LEN
-from .utils import Extractor, trim_text
+from .metrics import METRICS
+from .settings import (
+    CACHE_SIZE,
+    MAX_JSON_SIZE,
+    MAX_POSSIBLE_CANDIDATES,
+    MAX_SEGMENT_LEN,
+)
+from .utils import (
+    Extractor,
+    compile_pattern,
+    element_text,
+    json_loads,
+    search_windows,
+    trim_text,
+)
 from .validators import convert_date, correct_year, is_valid_date, validate_and_convert
 
 LOGGER = logging.getLogger(__name__)
@@ -81,9 +99,124 @@ DATE_EXPRESSIONS = """
 
 FREE_TEXT_EXPRESSIONS = XPath(FAST_PREPEND + "/text()")
 
+# CMS fingerprints: generator meta tag or characteristic markup,
+# then known locations of the publication and modification dates
+# (attributes first, then element text, outside of related posts and widgets)
+GENERATOR_EXPRESSION = XPath(
+    './meta[translate(@name, "GENRATO", "genrato")="generator"]/@content'
+)
+MAIN_CONTENT = '[not(ancestor::*[contains(@class, "related") or contains(@class, "widget") or contains(@class, "sidebar")])]'
+CMS_FINGERPRINTS = {
+    "wordpress": (
+        re.compile(r"^WordPress", re.I),
+        XPath(
+            './link[contains(@href, "/wp-content/") or contains(@href, "/wp-includes/")]'
+        ),
+        (
+            XPath(
+                './/time[contains(@class, "entry-date") or contains(@class, "published")]'
+                + MAIN_CONTENT
+                + "/@datetime"
+            ),
+            XPath(
+                './/*[contains(@class, "entry-date") or contains(@class, "posted-on")]'
+                + MAIN_CONTENT
+            ),
+        ),
+        (
+            XPath(
+                './/time[contains(concat(" ", @class, " "), " updated ")]'
+                + MAIN_CONTENT
+                + "/@datetime"
+            ),
+        ),
+    ),
+    "blogger": (
+        re.compile(r"^Blogger", re.I),
+        XPath('./link[contains(@href, "blogger.com/")]'),
+        (
+            XPath(
+                './/abbr[contains(@class, "published")]/@title|.//time[contains(@class, "published")]/@datetime'
+            ),
+            XPath('.//*[@class="date-header"]'),
+        ),
+        (),
+    ),
+    "drupal": (
+        re.compile(r"^Drupal", re.I),
+        XPath(
+            './link[contains(@href, "/sites/default/files/")]|'
+            './script[contains(@src, "/core/misc/drupal") or contains(@src, "/misc/drupal.js")]'
+        ),
+        (
+            XPath(
+                './/*[contains(@property, "dc:created") or @property="schema:dateCreated"]/@content'
+            ),
+            XPath(
+                './/*[contains(@class, "field--name-created") or contains(@class, "submitted")]'
+                + MAIN_CONTENT
+            ),
+        ),
+        (
+            XPath(
+                './/*[@property="dc:modified" or @property="schema:dateModified"]/@content'
+            ),
+        ),
+    ),
+    "ghost": (
+        re.compile(r"^Ghost", re.I),
+        None,
+        (
+            XPath(
+                './/time[contains(@class, "meta-date") or contains(@class, "post-date")]'
+                + MAIN_CONTENT
+                + "/@datetime"
+            ),
+        ),
+        (),
+    ),
+    "joomla": (
+        re.compile(r"^Joomla", re.I),
+        None,
+        (
+            XPath(
+                './/dd[contains(@class, "published") or contains(@class, "create")]//time/@datetime'
+            ),
+            XPath('.//dd[contains(@class, "published") or contains(@class, "create")]'),
+        ),
+        (XPath('.//dd[contains(@class, "modified")]//time/@datetime'),),
+    ),
+    "typo3": (
+        re.compile(r"^TYPO3", re.I),
+        None,
+        (
+            XPath(
+                './/*[contains(@class, "news-list-date") or contains(@class, "news-date")]'
+                + MAIN_CONTENT
+                + "//time/@datetime"
+            ),
+        ),
+        (),
+    ),
+}
+
 # discard parts of the webpage
 # archive.org banner inserts
+# all elements which may carry a date in their attributes, in document order
+METADATA_EXPRESSION = XPath(".//meta|.//time|.//abbr|.//*[@itemprop]|.//*[@property]")
 DISCARD_EXPRESSIONS = XPath('.//div[@id="wm-ipp-base" or @id="wm-ipp"]')
+# state of JavaScript frameworks (Next.js, Nuxt, Apollo, Redux) passed to the client
+STATE_GLOBALS = (
+    "__NUXT__",
+    "__APOLLO_STATE__",
+    "__INITIAL_STATE__",
+    "__PRELOADED_STATE__",
+)
+STATE_EXPRESSION = XPath(
+    './/script[@id="__NEXT_DATA__" or @id="__NUXT_DATA__" or '
+    + " or ".join(f'contains(substring(., 1, 100), "{name}")' for name in STATE_GLOBALS)
+    + "]"
+)
 # not discarded for consistency (see above):
 # .//footer
 # .//*[(self::div or self::section)][@id="footer" or @class="footer"]
@@ -93,6 +226,7 @@ MONTH_RE = "[0-1]?[0-9]"
 YEAR_RE = "199[0-9]|20[0-3][0-9]"
 
 # regex cache
+# patterns scanning whole documents use compile_pattern() (RE2 if available)
 YMD_NO_SEP_PATTERN = re.compile(r"\b(\d{8})\b")
 YMD_PATTERN = re.compile(
     rf"(?:\D|^)(?:(?P<year>{YEAR_RE})[\-/.](?P<month>{MONTH_RE})[\-/.](?P<day>{DAY_RE})|"
@@ -112,7 +246,7 @@ janvier|février|mars|juin|juillet|aout|septembre|octobre|novembre|décembre|
 Ocak|Şubat|Mart|Nisan|Mayıs|Haziran|Temmuz|Ağustos|Eylül|Ekim|Kasım|Aralık|
 Oca|Şub|Mar|Nis|Haz|Tem|Ağu|Eyl|Eki|Kas|Ara
 """  # todo: check "août"
-LONG_TEXT_PATTERN = re.compile(
+LONG_TEXT_PATTERN = compile_pattern(
     rf"""(?P<month>{REGEX_MONTHS})\s
 (?P<day>{DAY_RE})(?:st|nd|rd|th)?,? (?P<year>{YEAR_RE})|
 (?P<day2>{DAY_RE})(?:st|nd|rd|th|\.)? (?:of )?
@@ -121,12 +255,47 @@ LONG_TEXT_PATTERN = re.compile(
 )
 
 COMPLETE_URL = re.compile(rf"\D({YEAR_RE})[/_-]({MONTH_RE})[/_-]({DAY_RE})(?:\D|$)")
-
-JSON_MODIFIED = re.compile(rf'"dateModified": ?"({YEAR_RE}-{MONTH_RE}-{DAY_RE})', re.I)
-JSON_PUBLISHED = re.compile(
-    rf'"datePublished": ?"({YEAR_RE}-{MONTH_RE}-{DAY_RE})', re.I
+# further URL layouts: 20210312, ?date=2021-03-12 and /2021/03/
+# (scanned on batches of URLs separated by line breaks)
+COMPACT_URL = compile_pattern(
+    rf"[/_-]({YEAR_RE})(0[1-9]|1[0-2])(0[1-9]|[12][0-9]|3[01])(?:[/_.?#\n-]|$)"
 )
-TIMESTAMP_PATTERN = re.compile(
+QUERY_URL = compile_pattern(
+    rf"[?&][a-z_]*date=({YEAR_RE})-?({MONTH_RE})-?({DAY_RE})(?:[&#\n]|$)", re.I
+)
+PARTIAL_URL = compile_pattern(rf"/({YEAR_RE})/(0?[1-9]|1[0-2])/")
+
+# JSON-LD (and similar) keys, by order of preference
+JSON_MODIFIED = ("dateModified",)
+JSON_PUBLISHED = ("datePublished", "uploadDate")
+JSON_KEY_NAMES = {key.lower(): key for key in JSON_PUBLISHED + JSON_MODIFIED}
+# keys used by frameworks and content APIs, by order of preference
+STATE_PUBLISHED = JSON_PUBLISHED + (
+    "publishedAt",
+    "published_at",
+    "publishDate",
+    "publishedDate",
+    "publicationDate",
+    "firstPublishedAt",
+)
+STATE_MODIFIED = JSON_MODIFIED + (
+    "updatedAt",
+    "updated_at",
+    "modifiedAt",
+    "modifiedDate",
+    "lastModified",
+)
+# quoted or unquoted keys, string values or timestamps in (milli)seconds,
+# whole runs of digits being captured to check their length afterwards
+STATE_KEYS = compile_pattern(
+    rf'[{{,\s"]({"|".join(STATE_PUBLISHED + STATE_MODIFIED)})"?\s*:\s*'
+    r'(?:"([^"\\]{1,64})"|([0-9]{10,14}))'
+)
+JSON_DATE = re.compile(rf"({YEAR_RE}-{MONTH_RE}-{DAY_RE})")
+JSON_KEYS = compile_pattern(
+    r'"(datePublished|dateModified|uploadDate)"\s*:\s*"([^"\\]{1,64})"', re.I
+)
+TIMESTAMP_PATTERN = compile_pattern(
     rf"({YEAR_RE}-{MONTH_RE}-{DAY_RE}).[0-9]{{2}}:[0-9]{{2}}:[0-9]{{2}}"
 )
 
@@ -164,11 +333,10 @@ DISCARD_PATTERNS = re.compile(
     r"®"  # ©
 )
 
-# use of regex module for speed?
-TEXT_PATTERNS = re.compile(
-    r'(?:date[^0-9"]{,20}|updated|last-modified|published|posted|on)(?:[ :])*?([0-9]{1,4})[./]([0-9]{1,2})[./]([0-9]{2,4})|'  # EN
+TEXT_PATTERNS = compile_pattern(
+    r'(?:date[^0-9"]{0,20}|updated|last-modified|published|posted|on)(?:[ :])*?([0-9]{1,4})[./]([0-9]{1,2})[./]([0-9]{2,4})|'  # EN
     r"(?:Datum|Stand|Veröffentlicht am):? ?([0-9]{1,2})\.([0-9]{1,2})\.([0-9]{2,4})|"  # DE
-    r"(?:güncellen?me|yayı(?:m|n)lan?ma) *?(?:tarihi)? *?:? *?([0-9]{1,2})[./]([0-9]{1,2})[./]([0-9]{2,4})|"
+    r"(?:güncellen?me|yayı(?:m|n)lan?ma) *(?:tarihi *)?(?:: *)?([0-9]{1,2})[./]([0-9]{1,2})[./]([0-9]{2,4})|"
     r"([0-9]{1,2})[./]([0-9]{1,2})[./]([0-9]{2,4}) *?(?:'de|'da|'te|'ta|’de|’da|’te|’ta|tarihinde) *(?:güncellendi|yayı(?:m|n)landı)",  # TR
     re.I,
 )
@@ -182,29 +350,32 @@ TWO_COMP_REGEX = re.compile(rf"({MONTH_RE})[/.-]({YEAR_RE})")
 
 # extensive search patterns
 YEAR_PATTERN = re.compile(rf"^\D?({YEAR_RE})")
-COPYRIGHT_PATTERN = re.compile(
-    rf"(?:©|\&copy;|Copyright|\(c\))\D*(?:{YEAR_RE})?-?({YEAR_RE})\D"
+# the gap cannot span another mention, which would be scanned again (ReDoS)
+COPYRIGHT_PATTERN = compile_pattern(
+    r"(?:©|&copy;|Copyright|\(c\))"
+    r"(?:[^\d©&C(]|&(?!copy;)|C(?!opyright)|\((?!c\)))*"
+    rf"(?:{YEAR_RE})?-?({YEAR_RE})\D"
 )
 THREE_PATTERN = re.compile(r"/([0-9]{4}/[0-9]{2}/[0-9]{2})[01/]")
 THREE_CATCH = re.compile(r"([0-9]{4})/([0-9]{2})/([0-9]{2})")
-THREE_LOOSE_PATTERN = re.compile(r"\D([0-9]{4}[/.-][0-9]{2}[/.-][0-9]{2})\D")
+THREE_LOOSE_PATTERN = compile_pattern(r"\D([0-9]{4}[/.-][0-9]{2}[/.-][0-9]{2})\D")
 THREE_LOOSE_CATCH = re.compile(r"([0-9]{4})[/.-]([0-9]{2})[/.-]([0-9]{2})")
-SELECT_YMD_PATTERN = re.compile(r"\D([0-3]?[0-9][/.-][01]?[0-9][/.-][0-9]{4})\D")
+SELECT_YMD_PATTERN = compile_pattern(r"\D([0-3]?[0-9][/.-][01]?[0-9][/.-][0-9]{4})\D")
 SELECT_YMD_YEAR = re.compile(rf"({YEAR_RE})\D?$")
 YMD_YEAR = re.compile(rf"^({YEAR_RE})")
-DATESTRINGS_PATTERN = re.compile(
+DATESTRINGS_PATTERN = compile_pattern(
     r"(\D19[0-9]{2}[01][0-9][0-3][0-9]\D|\D20[0-9]{2}[01][0-9][0-3][0-9]\D)"
 )
 DATESTRINGS_CATCH = re.compile(rf"({YEAR_RE})([01][0-9])([0-3][0-9])")
-SLASHES_PATTERN = re.compile(
+SLASHES_PATTERN = compile_pattern(
     r"\D([0-3]?[0-9]/[01]?[0-9]/[0129][0-9]|[0-3][0-9]\.[01][0-9]\.[0129][0-9])\D"
 )
 SLASHES_YEAR = re.compile(r"([0-9]{2})$")
-YYYYMM_PATTERN = re.compile(r"\D([12][0-9]{3}[/.-](?:1[0-2]|0[1-9]))\D")
+YYYYMM_PATTERN = compile_pattern(r"\D([12][0-9]{3}[/.-](?:1[0-2]|0[1-9]))\D")
 YYYYMM_CATCH = re.compile(rf"({YEAR_RE})[/.-](1[0-2]|0[1-9]|)")
-MMYYYY_PATTERN = re.compile(r"\D([01]?[0-9][/.-][12][0-9]{3})\D")
+MMYYYY_PATTERN = compile_pattern(r"\D([01]?[0-9][/.-][12][0-9]{3})\D")
 MMYYYY_YEAR = re.compile(rf"({YEAR_RE})\D?$")
-SIMPLE_PATTERN = re.compile(rf"(?<!w3.org)\D({YEAR_RE})\D")
+SIMPLE_PATTERN = compile_pattern(rf"(?<!w3.org)\D({YEAR_RE})\D")
 
 
 def discard_unwanted(tree: HtmlElement) -> HtmlElement:
@@ -233,17 +404,65 @@ def extract_url_date(
     return None
 
 
+def extract_url_dates(urls: list[str], options: Extractor) -> list[str | None]:
+    """Extract the dates out of a list of URL strings in one go: each pattern
+    runs once over the joined URLs left without a date and the conversions
+    are shared between URLs."""
+    results: list[str | None] = [None] * len(urls)
+    pending = list(range(len(urls)))
+    layouts = [COMPLETE_URL, QUERY_URL, COMPACT_URL]
+    if options.extensive:
+        layouts.append(PARTIAL_URL)
+    converted: dict[tuple[str, ...], str | None] = {}
+    for pattern in layouts:
+        batch = [urls[i] for i in pending]
+        buffer = "\n".join(batch)
+        # URLs cannot contain line breaks, the buffer is split on them
+        if buffer.count("\n") >= len(batch):
+            buffer = "\n".join(url.replace("\n", " ") for url in batch)
+        starts = list(accumulate((len(url) + 1 for url in batch), initial=0))
+        found: dict[int, str | None] = {}
+        for match in pattern.finditer(buffer):
+            line = bisect_right(starts, match.start(1)) - 1
+            # first match per URL (as with a single search) inside the URL
+            if line in found or match.start() < starts[line]:
+                continue
+            parts = match.groups()
+            if parts not in converted:
+                try:
+                    dateobject = datetime(
+                        int(parts[0]),
+                        int(parts[1]),
+                        int(parts[2]) if len(parts) > 2 else 1,
+                    )
+                except ValueError:
+                    converted[parts] = None
+                else:
+                    converted[parts] = validate_and_convert(
+                        dateobject, options.format, options.min, options.max
+                    )
+            found[line] = results[pending[line]] = converted[parts]
+        pending = [i for line, i in enumerate(pending) if found.get(line) is None]
+        if not pending:
+            break
+    return results
+
+
 def try_swap_values(day: int, month: int) -> tuple[int, int]:
     """Swap day and month values if it seems feasible."""
     return (month, day) if month > 12 and day <= 12 else (day, month)
 
 
-def regex_parse(string: str) -> datetime | None:
+def regex_parse(string: str, guarded: bool = False) -> datetime | None:
     """Try full-text parse for date elements using a series of regular expressions
     with particular emphasis on English, French, German and Turkish"""
     # https://github.com/vi3k6i5/flashtext ?
     # multilingual day-month-year + American English patterns
-    match = LONG_TEXT_PATTERN.search(string)
+    match = (
+        search_windows(LONG_TEXT_PATTERN, string)
+        if guarded
+        else LONG_TEXT_PATTERN.search(string)
+    )
     if not match:
         return None
     groups = (
@@ -271,7 +490,9 @@ def custom_parse(
     string: str, outputformat: str, min_date: datetime, max_date: datetime
 ) -> str | None:
     """Try to bypass the slow dateparser"""
-    LOGGER.debug("custom parse test: %s", string)
+    debug = LOGGER.isEnabledFor(logging.DEBUG)
+    if debug:
+        LOGGER.debug("custom parse test: %s", string)
 
     # 1. shortcut
     if string[:4].isdigit():
@@ -283,22 +504,26 @@ def custom_parse(
                     int(string[:4]), int(string[4:6]), int(string[6:8])
                 )
             except ValueError:
-                LOGGER.debug("8-digit error: %s", string[:8])  # return None
+                if debug:
+                    LOGGER.debug("8-digit error: %s", string[:8])  # return None
         # b. much faster than extensive parsing
         else:
             try:
                 candidate = datetime.fromisoformat(string)
             except ValueError:
-                LOGGER.debug("not an ISO date string: %s", string)
+                if debug:
+                    LOGGER.debug("not an ISO date string: %s", string)
                 try:
                     candidate = dateutil_parse(string, fuzzy=False)  # ignoretz=True
                 except (OverflowError, TypeError, ValueError):
-                    LOGGER.debug("dateutil parsing error: %s", string)
+                    if debug:
+                        LOGGER.debug("dateutil parsing error: %s", string)
         # c. plausibility test
         if candidate is not None and (
             is_valid_date(candidate, outputformat, earliest=min_date, latest=max_date)
         ):
-            LOGGER.debug("parsing result: %s", candidate)
+            if debug:
+                LOGGER.debug("parsing result: %s", candidate)
             return candidate.strftime(outputformat)
 
     # 2. Try YYYYMMDD, use regex
@@ -308,10 +533,12 @@ def custom_parse(
             year, month, day = int(match[1][:4]), int(match[1][4:6]), int(match[1][6:8])
             candidate = datetime(year, month, day)
         except ValueError:
-            LOGGER.debug("YYYYMMDD value error: %s", match[0])
+            if debug:
+                LOGGER.debug("YYYYMMDD value error: %s", match[0])
         else:
             if is_valid_date(candidate, "%Y-%m-%d", earliest=min_date, latest=max_date):
-                LOGGER.debug("YYYYMMDD match: %s", candidate)
+                if debug:
+                    LOGGER.debug("YYYYMMDD match: %s", candidate)
                 return candidate.strftime(outputformat)
 
     # 3. Try the very common YMD, Y-M-D, and D-M-Y patterns
@@ -335,10 +562,12 @@ def custom_parse(
 
             candidate = datetime(year, month, day)
         except ValueError:  # pragma: no cover
-            LOGGER.debug("regex value error: %s", match[0])
+            if debug:
+                LOGGER.debug("regex value error: %s", match[0])
         else:
             if is_valid_date(candidate, "%Y-%m-%d", earliest=min_date, latest=max_date):
-                LOGGER.debug("regex match: %s", candidate)
+                if debug:
+                    LOGGER.debug("regex match: %s", candidate)
                 return candidate.strftime(outputformat)
 
     # 4. Try the Y-M and M-Y patterns
@@ -354,10 +583,12 @@ def custom_parse(
                     int(match.group("year2")), int(match.group("month2")), 1
                 )
         except ValueError:
-            LOGGER.debug("Y-M value error: %s", match[0])
+            if debug:
+                LOGGER.debug("Y-M value error: %s", match[0])
         else:
             if is_valid_date(candidate, "%Y-%m-%d", earliest=min_date, latest=max_date):
-                LOGGER.debug("Y-M match: %s", candidate)
+                if debug:
+                    LOGGER.debug("Y-M match: %s", candidate)
                 return candidate.strftime(outputformat)
 
     # 5. Try the other regex pattern
@@ -370,6 +601,8 @@ def custom_parse(
 def external_date_parser(string: str, outputformat: str) -> str | None:
     """Use dateutil parser or dateparser module according to system settings"""
     LOGGER.debug("send to external parser: %s", string)
+    if METRICS.enabled:
+        METRICS.count("external_date_parser_calls")
     try:
         target = EXTERNAL_PARSER.get_date_data(string)["date_obj"]
     # 2 types of errors possible
@@ -441,7 +674,11 @@ def pattern_search(
     options: Extractor,
 ) -> str | None:
     "Look for date expressions using a regular expression on a string of text."
-    match = date_pattern.search(text)
+    match = (
+        search_windows(date_pattern, text)
+        if options.guarded
+        else date_pattern.search(text)
+    )
     if match and is_valid_date(
         match[1], "%Y-%m-%d", earliest=options.min, latest=options.max
     ):
@@ -450,31 +687,191 @@ def pattern_search(
     return None
 
 
+def detect_cms(tree: HtmlElement) -> str | None:
+    """Identify the content management system used to generate the page
+    using the generator meta tag or characteristic markup in the header."""
+    head = tree.find(".//head")
+    if head is None:
+        return None
+    generators = GENERATOR_EXPRESSION(head)
+    for name, (generator, _, _, _) in CMS_FINGERPRINTS.items():
+        if any(generator.match(value) for value in generators):
+            return name
+    for name, (_, markup, _, _) in CMS_FINGERPRINTS.items():
+        if markup is not None and markup(head):
+            return name
+    return None
+
+
+def cms_search(
+    tree: HtmlElement,
+    cms: str | None,
+    options: Extractor,
+) -> str | None:
+    """Look for dates at the known locations of the detected CMS"""
+    if cms is None:
+        return None
+    _, _, published, modified = CMS_FINGERPRINTS[cms]
+    for expression in published if options.original else modified + published:
+        candidates = expression(tree)
+        if len(candidates) > MAX_POSSIBLE_CANDIDATES:
+            continue
+        for item in candidates:
+            text = item if isinstance(item, str) else element_text(item)
+            result = try_date_expr(
+                trim_text(text),
+                options.format,
+                options.extensive,
+                options.min,
+                options.max,
+            )
+            if result is not None:
+                LOGGER.debug("date found at %s location: %s", cms, text)
+                return result
+    return None
+
+
+def iter_json_items(data: Any) -> Iterator[tuple[str, str]]:
+    """Yield the keys and string values of parsed JSON data, shallow items
+    first so that the main entity comes before nested ones (e.g. comments),
+    @graph arrays and other nestings being traversed as well. The date keys
+    are normalized since their case varies."""
+    queue = deque([data])
+    while queue:
+        item = queue.popleft()
+        if isinstance(item, dict):
+            for name, value in item.items():
+                key = JSON_KEY_NAMES.get(name.lower()) or name
+                if isinstance(value, str):
+                    yield key, value
+                elif isinstance(value, dict) and isinstance(value.get("@value"), str):
+                    yield key, value["@value"]
+                elif isinstance(value, list) and value and isinstance(value[0], str):
+                    yield key, value[0]
+                elif isinstance(value, (dict, list)):
+                    queue.append(value)
+        elif isinstance(item, list):
+            queue.extend(item)
+
+
+def scan_json_items(text: str) -> Iterator[tuple[str, str]]:
+    """Yield the date keys and their values found in JSON text which is too
+    large or not valid, in a single pass and without decoding it."""
+    for count, match in enumerate(JSON_KEYS.finditer(text)):
+        if count >= MAX_POSSIBLE_CANDIDATES:
+            break
+        yield JSON_KEY_NAMES[match[1].lower()], match[2]
+
+
+def convert_json_date(value: str | int, options: Extractor) -> str | None:
+    "Validate and convert a date string or a timestamp found in JSON data."
+    if isinstance(value, int):
+        try:
+            dateobject = datetime.fromtimestamp(value, timezone.utc)
+        except (OSError, OverflowError, ValueError):
+            return None
+        return validate_and_convert(
+            dateobject.replace(tzinfo=None), options.format, options.min, options.max
+        )
+    match = JSON_DATE.match(value.strip())
+    if match:
+        if is_valid_date(
+            match[1], "%Y-%m-%d", earliest=options.min, latest=options.max
+        ):
+            return convert_date(match[1], "%Y-%m-%d", options.format)
+        return None
+    return try_date_expr(
+        value, options.format, options.extensive, options.min, options.max
+    )
+
+
+def select_json_date(
+    items: Iterable[tuple[str, str | int]],
+    keys: tuple[str, ...],
+    options: Extractor,
+) -> str | None:
+    """Return the first valid date for the preferred key, or else for the
+    other keys, stopping as soon as the preferred key is found."""
+    found: dict[str, str] = {}
+    for key, value in items:
+        if key not in keys or key in found:
+            continue
+        result = convert_json_date(value, options)
+        if result is None:
+            continue
+        if key == keys[0]:
+            return result
+        found[key] = result
+    return next((found[key] for key in keys if key in found), None)
+
+
+def scan_state_items(text: str) -> Iterator[tuple[str, str | int]]:
+    """Yield the date keys and their values found in the state of a
+    JavaScript framework, in a single pass and without decoding it."""
+    for count, match in enumerate(STATE_KEYS.finditer(text)):
+        if count >= MAX_POSSIBLE_CANDIDATES:
+            break
+        if match[2] is not None:
+            yield match[1], match[2]
+        elif len(match[3]) in (10, 13):
+            yield match[1], int(match[3]) // (1000 if len(match[3]) == 13 else 1)
+
+
 def json_search(
     tree: HtmlElement,
     options: Extractor,
 ) -> str | None:
-    """Look for JSON time patterns in JSON sections of the tree"""
-    # determine pattern
-    json_pattern = JSON_PUBLISHED if options.original else JSON_MODIFIED
+    """Look for dates in JSON sections of the tree, parsing them (including
+    @graph arrays and nested entities) or scanning them if they are large
+    or malformed"""
+    keys = JSON_PUBLISHED if options.original else JSON_MODIFIED
     # look throughout the HTML tree
     for elem in tree.xpath(
         './/script[@type="application/ld+json" or @type="application/settings+json"]'
     ):
-        if not elem.text or '"date' not in elem.text:
+        text = elem.text
+        if not text or "date" not in text.lower():
             continue
-        result = pattern_search(elem.text, json_pattern, options)
+        items: Iterable[tuple[str, str | int]]
+        if len(text) > MAX_JSON_SIZE:
+            items = scan_json_items(text)
+        else:
+            try:
+                items = iter_json_items(json_loads(text))
+            except (RecursionError, ValueError):
+                LOGGER.debug("malformed JSON data, scanning instead")
+                items = scan_json_items(text)
+        result = select_json_date(items, keys, options)
         if result is not None:
             return result
     return None
 
 
+def state_search(
+    tree: HtmlElement,
+    options: Extractor,
+) -> str | None:
+    """Look for well-known date keys in the state of JavaScript frameworks
+    (Next.js, Nuxt, Apollo), which may contain the only date of the page"""
+    keys = STATE_PUBLISHED if options.original else STATE_MODIFIED
+    for elem in STATE_EXPRESSION(tree):
+        if elem.text:
+            result = select_json_date(scan_state_items(elem.text), keys, options)
+            if result is not None:
+                return result
+    return None
+
+
 def idiosyncrasies_search(
     htmlstring: str,
     options: Extractor,
 ) -> str | None:
     """Look for author-written dates throughout the web page"""
-    match = TEXT_PATTERNS.search(htmlstring)  # EN+DE+TR
+    match = (
+        search_windows(TEXT_PATTERNS, htmlstring)
+        if options.guarded
+        else TEXT_PATTERNS.search(htmlstring)
+    )  # EN+DE+TR
     if match:
         parts = list(filter(None, match.groups()))
 
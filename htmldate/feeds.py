@@ -0,0 +1,127 @@
+"""
+Stream the dates out of XML sitemaps and RSS/Atom feeds.
+"""
+
+import gzip
+import logging
+
+from collections.abc import Iterator
+from datetime import datetime
+from io import BytesIO
+from typing import IO
+
+from lxml.etree import XMLSyntaxError, _Element, iterparse
+
+from .extractors import try_date_expr
+from .validators import get_max_date, get_min_date, is_valid_format
+
+LOGGER = logging.getLogger(__name__)
+
+# sitemap URLs and sitemap indexes, RSS items and Atom entries
+ENTRY_TAGS = ("{*}url", "{*}sitemap", "{*}item", "{*}entry")
+# news:publication_date, pubDate, dc:date, Atom and Dublin Core dates
+PUBLISHED_TAGS = ("publication_date", "pubDate", "published", "issued", "date")
+UPDATED_TAGS = ("lastmod", "updated", "modified")
+
+
+def open_source(source: bytes | str | IO[bytes]) -> IO[bytes] | gzip.GzipFile:
+    "Return a binary stream for a file path, a bytestring or a file object."
+    if isinstance(source, str):
+        if source.endswith(".gz"):
+            return gzip.open(source, "rb")
+        return open(source, "rb")
+    if isinstance(source, bytes):
+        stream: IO[bytes] = BytesIO(source)
+        if source[:2] == b"\x1f\x8b":
+            return gzip.GzipFile(fileobj=stream)
+        return stream
+    return source
+
+
+def examine_entry(entry: _Element) -> tuple[str | None, dict[str, str]]:
+    "Find the link and the date strings of a sitemap or feed entry."
+    # ranked links: location or alternate link, other links, identifiers
+    links: dict[int, str] = {}
+    values: dict[str, str] = {}
+    for elem in entry.iterdescendants():
+        tag = elem.tag
+        if not isinstance(tag, str):
+            continue
+        name = tag.rpartition("}")[2]
+        text = (elem.text or "").strip()
+        if name == "link" and elem.get("href"):
+            rank = 0 if elem.get("rel", "alternate") == "alternate" else 1
+            links.setdefault(rank, elem.get("href", "").strip())
+        elif name in ("loc", "link") and text:
+            links.setdefault(0, text)
+        elif name in ("guid", "id") and text:
+            links.setdefault(2, text)
+        elif text:
+            values.setdefault(name, text)
+    return (links[min(links)] if links else None), values
+
+
+def find_feed_dates(
+    source: bytes | str | IO[bytes],
+    extensive_search: bool = True,
+    original_date: bool = False,
+    outputformat: str = "%Y-%m-%d",
+    min_date: datetime | str | None = None,
+    max_date: datetime | str | None = None,
+) -> Iterator[tuple[str, str | None]]:
+    """
+    Extract the URLs and their dates from an XML sitemap (also a sitemap
+    index or Google News sitemap) or from a RSS or Atom feed. The document
+    is parsed incrementally and processed entries are discarded, so that
+    large files are handled in bounded memory.
+
+    :param source:
+        Path to the file (possibly gzipped), XML document or binary file object
+    :type source: string, bytes or file object
+    :param extensive_search:
+        Use the external date parser on unusual date formats
+    :type extensive_search: boolean
+    :param original_date:
+        Prefer the publication date over the last modification
+    :type original_date: boolean
+    :param outputformat, min_date, max_date:
+        Same as in find_date()
+    :return: Yields (URL, date) tuples, the date being None if not found
+
+    """
+    if outputformat != "%Y-%m-%d" and not is_valid_format(outputformat):
+        return
+    earliest, latest = get_min_date(min_date), get_max_date(max_date)
+    tags = (
+        PUBLISHED_TAGS + UPDATED_TAGS
+        if original_date
+        else UPDATED_TAGS + PUBLISHED_TAGS
+    )
+    stream = None
+    try:
+        stream = open_source(source)
+        for _, entry in iterparse(
+            stream, events=("end",), tag=ENTRY_TAGS, resolve_entities=False
+        ):
+            link, values = examine_entry(entry)
+            # free the memory used by the entry and the previous ones
+            entry.clear(keep_tail=True)
+            parent = entry.getparent()
+            while parent is not None and entry.getprevious() is not None:
+                del parent[0]
+            if not link:
+                continue
+            result = None
+            for tag in tags:
+                if tag in values:
+                    result = try_date_expr(
+                        values[tag], outputformat, extensive_search, earliest, latest
+                    )
+                    if result is not None:
+                        break
+            yield link, result
+    except (OSError, XMLSyntaxError) as err:
+        LOGGER.error("cannot parse feed: %s", err)
+    finally:
+        if stream is not None and stream is not source:
+            stream.close()
@@ -3,6 +3,7 @@ Meta-functions to be applied module-wide.
 """
 
 import logging
+from typing import Any
 
 from .core import compare_reference
 from .extractors import try_date_expr
@@ -11,10 +12,25 @@ from .validators import filter_ymd_candidate, is_valid_date, is_valid_format
 LOGGER = logging.getLogger(__name__)
 
 
+# LRU caches cleared by reset_caches() and reported by cache_stats()
+CACHED_FUNCTIONS: tuple[Any, ...] = (
+    compare_reference,
+    filter_ymd_candidate,
+    is_valid_date,
+    is_valid_format,
+    try_date_expr,
+)
+
 try:
     from charset_normalizer.cd import encoding_languages
     from charset_normalizer.md import is_suspiciously_successive_range
     from charset_normalizer.utils import is_accentuated
+
+    CACHED_FUNCTIONS += (
+        encoding_languages,
+        is_suspiciously_successive_range,
+        is_accentuated,
+    )
 # prevent possible changes in function names
 except ImportError:
     LOGGER.error("impossible to import charset function name")
@@ -23,17 +39,26 @@ except ImportError:
 def reset_caches() -> None:
     """Reset all known LRU caches used to speed-up processing.
     This may release some memory."""
-    # htmldate
-    compare_reference.cache_clear()
-    filter_ymd_candidate.cache_clear()
-    is_valid_date.cache_clear()
-    is_valid_format.cache_clear()
-    try_date_expr.cache_clear()
-    # charset_normalizer
-    try:
-        encoding_languages.cache_clear()
-        is_suspiciously_successive_range.cache_clear()
-        is_accentuated.cache_clear()
-    # prevent possible changes in function names
-    except (AttributeError, NameError) as err:  # pragma: no cover
-        LOGGER.error("impossible to clear cache for function: %s", err)
+    for func in CACHED_FUNCTIONS:
+        try:
+            func.cache_clear()
+        # prevent possible changes in function names
+        except AttributeError as err:  # pragma: no cover
+            LOGGER.error("impossible to clear cache for function: %s", err)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Return the hits, misses and current size of the LRU caches
+    cleared by reset_caches()."""
+    stats = {}
+    for func in CACHED_FUNCTIONS:
+        try:
+            info = func.cache_info()
+        except AttributeError:  # pragma: no cover
+            continue
+        stats[func.__name__] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "currsize": info.currsize,
+        }
+    return stats
@@ -0,0 +1,125 @@
+"""
+Optional in-process metrics on extraction steps and caches.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+from typing import Any
+
+# upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class MetricsRegistry:
+    """Count the results of each extraction step, store their latencies
+    in histograms and count the calls to the external date parser.
+    Nothing is recorded unless the registry is enabled."""
+
+    __slots__ = ["buckets", "counters", "enabled", "latencies", "lock", "results"]
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counters: Counter[str] = Counter()
+        self.enabled = False
+        # stage -> counts per bucket (the last one being +Inf), sum
+        self.latencies: dict[str, tuple[list[int], list[float]]] = {}
+        self.lock = Lock()
+        self.results: Counter[tuple[str, str]] = Counter()
+
+    def enable(self) -> None:
+        "Start recording."
+        self.enabled = True
+
+    def disable(self) -> None:
+        "Stop recording, the values are kept."
+        self.enabled = False
+
+    def reset(self) -> None:
+        "Delete all recorded values."
+        with self.lock:
+            self.counters.clear()
+            self.latencies.clear()
+            self.results.clear()
+
+    def observe(self, stage: str, result: str | None, duration: float) -> None:
+        "Record the outcome and the duration of an extraction step."
+        index = bisect_left(self.buckets, duration)
+        with self.lock:
+            self.results[stage, "found" if result is not None else "none"] += 1
+            counts, total = self.latencies.setdefault(
+                stage, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += duration
+
+    def count(self, name: str) -> None:
+        "Increment a counter, e.g. calls to the external date parser."
+        with self.lock:
+            self.counters[name] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        "Return a copy of the recorded values along with the cache statistics."
+        from .meta import cache_stats  # pylint: disable=import-outside-toplevel
+
+        with self.lock:
+            stages: dict[str, Any] = {}
+            for (stage, outcome), value in self.results.items():
+                stages.setdefault(stage, {"found": 0, "none": 0})[outcome] = value
+            for stage, (counts, total) in self.latencies.items():
+                stages[stage]["latency"] = {
+                    "buckets": dict(zip(self.buckets + (float("inf"),), counts)),
+                    "sum": total[0],
+                    "count": sum(counts),
+                }
+            counters = {"external_date_parser_calls": 0, **self.counters}
+        return {"stages": stages, "counters": counters, "caches": cache_stats()}
+
+    def to_prometheus(self, prefix: str = "htmldate") -> str:
+        "Export the values in the Prometheus text format."
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_results Results of the extraction steps.",
+            f"# TYPE {prefix}_stage_results counter",
+        ]
+        for stage, values in snapshot["stages"].items():
+            for outcome in ("found", "none"):
+                lines.append(
+                    f'{prefix}_stage_results_total{{stage="{stage}",outcome="{outcome}"}} {values[outcome]}'
+                )
+        lines += [
+            f"# HELP {prefix}_stage_duration_seconds Duration of the extraction steps.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for stage, values in snapshot["stages"].items():
+            cumulative = 0
+            for bound, value in values["latency"]["buckets"].items():
+                cumulative += value
+                label = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{label}"}} {cumulative}'
+                )
+            lines += [
+                f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {values["latency"]["sum"]}',
+                f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {values["latency"]["count"]}',
+            ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines += [
+                f"# TYPE {prefix}_{name} counter",
+                f"{prefix}_{name}_total {value}",
+            ]
+        # counter families are declared without the suffix of their samples
+        for metric, field, kind, suffix in (
+            ("cache_hits", "hits", "counter", "_total"),
+            ("cache_misses", "misses", "counter", "_total"),
+            ("cache_size", "currsize", "gauge", ""),
+        ):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for cache, info in snapshot["caches"].items():
+                lines.append(
+                    f'{prefix}_{metric}{suffix}{{cache="{cache}"}} {info[field]}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,86 @@
+"""
+Learn which extraction step finds the date on a given website.
+"""
+
+import json
+import logging
+
+from collections import Counter
+from threading import Lock
+from urllib.parse import urlsplit
+
+LOGGER = logging.getLogger(__name__)
+
+# usual second levels of country code domains, e.g. co.uk, com.au, or.at
+SECOND_LEVELS = {
+    "ac",
+    "co",
+    "com",
+    "edu",
+    "go",
+    "gob",
+    "gov",
+    "gv",
+    "ne",
+    "net",
+    "or",
+    "org",
+}
+
+
+def get_domain(url: str | None) -> str | None:
+    """Approximate the registered domain of a URL, e.g. "example.org" for
+    "https://www.blog.example.org/page" or "example.co.uk" for country
+    code domains with a usual second level."""
+    if not url:
+        return None
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    labels = host.rstrip(".").split(".")
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class StageRouter:
+    """Record which extraction step produced the result for each domain,
+    so that the same step can be tried first the next time. The standard
+    sequence of steps is used as a fallback."""
+
+    __slots__ = ["domains", "lock"]
+
+    def __init__(self, domains: dict[str, dict[str, int]] | None = None) -> None:
+        self.domains: dict[str, Counter[str]] = {
+            domain: Counter(stages) for domain, stages in (domains or {}).items()
+        }
+        self.lock = Lock()
+
+    def get(self, url: str | None) -> str | None:
+        "Return the step which most often found the date for this domain."
+        with self.lock:
+            stages = self.domains.get(get_domain(url) or "")
+            return stages.most_common(1)[0][0] if stages else None
+
+    def record(self, url: str | None, stage: str) -> None:
+        "Store the step which found the date for this domain."
+        domain = get_domain(url)
+        if domain is not None:
+            with self.lock:
+                self.domains.setdefault(domain, Counter())[stage] += 1
+
+    def save(self, filename: str) -> None:
+        "Write the learned routes to a JSON file."
+        with self.lock:
+            domains = {domain: dict(stages) for domain, stages in self.domains.items()}
+        with open(filename, "w", encoding="utf-8") as outputfile:
+            json.dump(domains, outputfile)
+
+    @classmethod
+    def load(cls, filename: str) -> "StageRouter":
+        "Read learned routes from a JSON file."
+        with open(filename, "r", encoding="utf-8") as inputfile:
+            return cls(json.load(inputfile))
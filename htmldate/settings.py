@@ -10,6 +10,8 @@ CACHE_SIZE: int = 8192
 
 # Download
 MAX_FILE_SIZE: int = 20000000
+# size of the document beginning requested first in head probe mode (bytes)
+HEAD_PROBE_SIZE: int = 65536
 
 # Plausible dates
 # earliest possible date to take into account (inclusive)
@@ -22,6 +24,17 @@ MAX_POSSIBLE_CANDIDATES: int = 1000
 MIN_SEGMENT_LEN: int = 6
 MAX_SEGMENT_LEN: int = 52
 
+# Guarded scan: whole documents are searched in windows of bounded size
+# (in characters), overlapping so that matches on the edges are kept
+SCAN_WINDOW: int = 16384
+SCAN_OVERLAP: int = 1024
+
+# JSON data larger than this (in characters) is scanned instead of parsed
+MAX_JSON_SIZE: int = 100000
+
+# URL-only extraction: number of URLs searched together
+URL_BATCH_SIZE: int = 10000
+
 CLEANING_LIST = [
     "applet",
     "audio",
@@ -0,0 +1,66 @@
+"""
+Record the decisions taken while processing a single document.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(slots=True)
+class TraceEvent:
+    "Defines a class to store the outcome of an extraction step."
+
+    step: str
+    result: str | None = None
+    duration: float = 0.0
+
+
+class Trace:
+    """In-memory trace of a single call to find_date(): extraction steps
+    in the order they were tried, their result and the time they took.
+    Unlike the verbose mode it doesn't touch the logging configuration,
+    so that it can be used for one document in a multi-threaded service."""
+
+    __slots__ = ["events", "result"]
+
+    def __init__(self) -> None:
+        self.events: list[TraceEvent] = []
+        self.result: str | None = None
+
+    def __iter__(self) -> Iterator[TraceEvent]:
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def add(self, step: str, result: str | None = None, duration: float = 0.0) -> None:
+        "Record the outcome of an extraction step."
+        self.events.append(TraceEvent(step, result, duration))
+
+    @property
+    def steps(self) -> list[str]:
+        "Extraction steps in the order they were tried."
+        return [event.step for event in self.events]
+
+    @property
+    def duration(self) -> float:
+        "Total time spent in the recorded steps."
+        return sum(event.duration for event in self.events)
+
+    def to_dict(self) -> dict[str, Any]:
+        "Return the trace as a dictionary, e.g. for JSON output."
+        return {
+            "result": self.result,
+            "steps": [
+                {"step": e.step, "result": e.result, "duration": e.duration}
+                for e in self.events
+            ],
+        }
+
+    def __str__(self) -> str:
+        lines = [
+            f"{e.step}: {e.result} ({e.duration * 1000:.3f} ms)" for e in self.events
+        ]
+        lines.append(f"result: {self.result}")
+        return "\n".join(lines)
@@ -3,12 +3,16 @@
 Module bundling functions related to HTML processing.
 """
 
+import json
 import logging
 import re
 
+from collections.abc import Callable, Mapping
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any
+from functools import lru_cache
+from html import unescape
+from typing import Any, TypeGuard
 
 import urllib3
 
@@ -19,12 +23,43 @@ except ImportError:
     cchardet_detect = None
 from charset_normalizer import from_bytes
 
+# RE2 matches in linear time and is faster on whole documents
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 from lxml.html import HtmlElement, HTMLParser, fromstring
 
-from .settings import MAX_FILE_SIZE
+from .settings import (
+    CACHE_SIZE,
+    CLEANING_LIST,
+    HEAD_PROBE_SIZE,
+    MAX_FILE_SIZE,
+    MAX_SEGMENT_LEN,
+    SCAN_OVERLAP,
+    SCAN_WINDOW,
+)
+
+# orjson decodes JSON faster than the standard library
+json_loads: Callable[[str], Any]
+try:
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 LOGGER = logging.getLogger(__name__)
 
+# Unicode equivalents of the character classes of the re module in RE2
+RE2_CLASSES = {
+    r"\d": r"\p{Nd}",
+    r"\s": r"\s\x0b\x1c-\x1f\x85\p{Z}",
+    r"\w": r"\p{L}\p{N}_",
+}
+RE2_NEGATED_CLASSES = {r"\D", r"\S", r"\W"}
+
 UNICODE_ALIASES: set[str] = {"utf-8", "utf_8"}
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -41,6 +76,17 @@ HTML_PARSER = HTMLParser(
 
 DOCTYPE_TAG = re.compile("^< ?! ?DOCTYPE.+?/ ?>", re.I)
 FAULTY_HTML = re.compile(r"(<html.*?)\s*/>", re.I)
+CONTENT_RANGE = re.compile(r"bytes 0-(\d+)/(\d+)")
+# comments, tags of the elements deleted by clean_html() or containing
+# raw text, and character references
+RAW_TEXT_ELEMENTS = {"script", "style"}
+MARKUP_TOKENS = re.compile(
+    rf"<!--|<(/?)({'|'.join(CLEANING_LIST + sorted(RAW_TEXT_ELEMENTS))})\b[^<>]*>|"
+    r"&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]{0,31});?",
+    re.I,
+)
+RAW_TEXT_ENDS = {name: re.compile(rf"</{name}\b", re.I) for name in RAW_TEXT_ELEMENTS}
+VOID_ELEMENTS = {"embed", "frame", "track"}
 
 
 # eq=False keeps identity-based hashing so instances stay usable as lru_cache keys
@@ -53,6 +99,17 @@ class Extractor:
     min: datetime
     original: bool
     format: str
+    guarded: bool = False
+
+
+@dataclass(slots=True)
+class Response:
+    "Store the decoded body of a HTTP response along with its headers."
+
+    data: str
+    headers: dict[str, str]
+    status: int
+    url: str
 
 
 def is_wrong_document(data: str | bytes | HtmlElement | None) -> bool:
@@ -120,35 +177,105 @@ def decode_response(response: Any) -> str:
     return decode_file(data) if data else ""
 
 
-def fetch_url(url: str) -> str | None:
+def send_request(url: str, headers: dict[str, str] | None = None) -> Any:
+    """Send a GET request using the module-wide connection pool
+    and return the urllib3 response, or None if there was a network problem."""
+    try:
+        # read by streaming chunks (stream=True, iter_content=xx)
+        # so we can stop downloading as soon as MAX_FILE_SIZE is reached
+        return HTTP_POOL.request("GET", url, headers=headers, timeout=30)
+    except Exception as err:
+        LOGGER.error("download error: %s %s", url, err)  # sys.exc_info()[0]
+    return None
+
+
+def normalize_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    "Copy HTTP headers into a dictionary with lowercase keys."
+    return {key.lower(): value for key, value in headers.items()}
+
+
+def fetch_response(url: str, headers: dict[str, str] | None = None) -> Response | None:
     """Fetches page using urllib3 and decodes the response.
 
     Args:
         url: URL of the page to fetch.
+        headers: Additional request headers, e.g. for conditional requests.
 
     Returns:
-        HTML code as string, or Urllib3 response object (headers + body), or empty string in case
-        the result is invalid, or None if there was a problem with the network.
+        Response object storing the decoded body (empty string in case the result
+        is invalid or the document has not been modified) along with the response
+        headers, or None if there was a problem with the network or the server
+        didn't send a 200 or 304 response.
 
     """
-    # send
-    try:
-        # read by streaming chunks (stream=True, iter_content=xx)
-        # so we can stop downloading as soon as MAX_FILE_SIZE is reached
-        response = HTTP_POOL.request("GET", url, timeout=30)
-    except Exception as err:
-        LOGGER.error("download error: %s %s", url, err)  # sys.exc_info()[0]
-    else:
+    response = send_request(url, headers=headers)
+    if response is not None:
         # safety checks
+        if response.status == 304:
+            return Response("", normalize_headers(response.headers), 304, url)
         if response.status != 200:
             LOGGER.error("not a 200 response: %s for URL %s", response.status, url)
         elif is_wrong_document(response.data):
             LOGGER.error("incorrect input data for URL %s", url)
         else:
-            return decode_response(response.data)
+            return Response(
+                decode_response(response.data),
+                normalize_headers(response.headers),
+                response.status,
+                url,
+            )
     return None
 
 
+def fetch_url(url: str) -> str | None:
+    """Fetches page using urllib3 and decodes the response.
+
+    Args:
+        url: URL of the page to fetch.
+
+    Returns:
+        HTML code as string, or None if there was a problem with the network
+        or the result is invalid. Use fetch_response() to get the headers too.
+
+    """
+    response = fetch_response(url)
+    return response.data if response is not None else None
+
+
+def fetch_head(url: str) -> tuple[str | None, bool]:
+    """Fetches the beginning of a page using a HTTP range request.
+
+    Args:
+        url: URL of the page to fetch.
+
+    Returns:
+        A tuple consisting of the decoded document prefix (or None if the
+        download failed) and a boolean indicating if the whole document
+        has been retrieved, e.g. because the server ignored the range header.
+
+    """
+    response = send_request(url, headers={"Range": f"bytes=0-{HEAD_PROBE_SIZE - 1}"})
+    if response is None or is_wrong_document(response.data):
+        return None, False
+    # full document sent anyway
+    if response.status == 200:
+        return decode_response(response.data), True
+    if response.status != 206:
+        LOGGER.error("not a 200/206 response: %s for URL %s", response.status, url)
+        return None, False
+    # partial content: the prefix may cover the whole document
+    match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    complete = match is not None and int(match[1]) + 1 == int(match[2])
+    # cut at the last tag boundary to avoid truncated characters
+    data = response.data if complete else response.data[: response.data.rfind(b">") + 1]
+    return decode_response(data), complete
+
+
+def is_url(string: Any) -> TypeGuard[str]:
+    "Check if the input is a string which looks like a URL."
+    return isinstance(string, str) and string.startswith("http") and " " not in string
+
+
 def is_dubious_html(beginning: str) -> bool:
     "Assess if the object is proper HTML (awith a corresponding tag or declaration)."
     return "html" not in beginning
@@ -190,11 +317,7 @@ def load_html(htmlobject: bytes | str | HtmlElement) -> HtmlElement | None:
     if not isinstance(htmlobject, (bytes, str)):
         raise TypeError(f"incompatible input type: {type(htmlobject)}")
     # the string is a URL, download it
-    if (
-        isinstance(htmlobject, str)
-        and htmlobject.startswith("http")
-        and " " not in htmlobject
-    ):
+    if is_url(htmlobject):
         LOGGER.debug("URL detected, downloading: %s", htmlobject)
         downloaded = fetch_url(htmlobject)
         # log the error and quit
@@ -246,6 +369,169 @@ def clean_html(tree: HtmlElement, elemlist: list[str]) -> HtmlElement:
     return tree
 
 
+@lru_cache(maxsize=CACHE_SIZE)
+def decode_reference(reference: str) -> str | None:
+    """Decode a character reference as found in the serialized tree,
+    return None if it is left as is."""
+    text = unescape(reference)
+    # markup characters are escaped by the serialization
+    if text == reference or any(char in text for char in '"&<>'):
+        return None
+    return text
+
+
+def mask_html(htmlstring: str) -> str:
+    """Counterpart of clean_html() and of the serialization of the tree on
+    the source string: skip the elements of the cleaning list in a single
+    pass (unclosed elements are kept) and decode the character references,
+    comments and raw text (scripts and styles) being left untouched.
+    The string is returned as is if there is nothing to change."""
+    parts: list[str] = []
+    position, depth, name, start = 0, 0, "", 0
+    match = MARKUP_TOKENS.search(htmlstring)
+    while match is not None:
+        end = match.end()
+        if match[0] == "<!--":
+            end = htmlstring.find("-->", end)
+            end = len(htmlstring) if end == -1 else end + 3
+        elif match[0][0] == "&":
+            text = decode_reference(match[0]) if depth == 0 else None
+            if text is not None:
+                parts += [htmlstring[position : match.start()], text]
+                position = end
+        elif (tag := match[2].lower()) in RAW_TEXT_ELEMENTS:
+            if not match[1]:
+                closing = RAW_TEXT_ENDS[tag].search(htmlstring, end)
+                end = len(htmlstring) if closing is None else closing.start()
+        # closing tags without opening tag are ignored
+        elif depth == 0 and not match[1]:
+            if tag in VOID_ELEMENTS or match[0].endswith("/>"):
+                parts.append(htmlstring[position : match.start()])
+                position = end
+            else:
+                depth, name, start = 1, tag, match.start()
+        elif depth > 0 and tag == name and not match[0].endswith("/>"):
+            depth += -1 if match[1] else 1
+            if depth == 0:
+                parts.append(htmlstring[position:start])
+                position = end
+        match = MARKUP_TOKENS.search(htmlstring, end)
+    if not parts:
+        return htmlstring
+    parts.append(htmlstring[position:])
+    return "".join(parts)
+
+
+def unicode_classes(pattern: str) -> str | None:
+    """Translate the character classes of a regular expression to their
+    Unicode equivalents in RE2 syntax, since the RE2 classes only cover
+    ASCII characters. Return None if the pattern cannot be translated."""
+    translated, in_class, i = [], False, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escape = pattern[i : i + 2]
+            i += 2
+            if escape in RE2_NEGATED_CLASSES:
+                if in_class:
+                    return None
+                translated.append(f"[^{RE2_CLASSES[escape.lower()]}]")
+            elif escape in RE2_CLASSES:
+                value = RE2_CLASSES[escape]
+                translated.append(value if in_class else f"[{value}]")
+            elif escape in ("\\b", "\\B"):
+                return None
+            else:
+                translated.append(escape)
+            continue
+        if char == "[" and not in_class:
+            in_class = True
+            # a closing bracket at the start of a class is a literal
+            start = i + 1 + (pattern[i + 1 : i + 2] == "^")
+            if pattern[start : start + 1] == "]":
+                start += 1
+            translated.append(pattern[i:start])
+            i = start
+            continue
+        if char == "]":
+            in_class = False
+        translated.append(char)
+        i += 1
+    return "".join(translated)
+
+
+def compile_pattern(pattern: str, flags: int = 0) -> re.Pattern[str]:
+    """Compile a regular expression meant to scan whole documents with the
+    RE2 engine if it is installed and supports the syntax, falling back
+    to the re module (e.g. for lookaround assertions or word boundaries).
+    Only the re.I flag is translated, other flags always lead to the re
+    module."""
+    translated = unicode_classes(pattern) if re2 is not None else None
+    if translated is not None and not flags & ~re.I:
+        options = re2.Options()
+        options.case_sensitive = not flags & re.I
+        options.log_errors = False
+        try:
+            return re2.compile(translated, options)
+        except re2.error:
+            pass
+    return re.compile(pattern, flags)
+
+
+def search_windows(pattern: re.Pattern[str], string: str) -> re.Match[str] | None:
+    """Same as pattern.search() on bounded windows of the string, so that
+    the cost of a pathological input cannot exceed the cost of its windows.
+    Matches longer than the overlap between windows may be missed."""
+    # RE2 runs in linear time and would encode the whole string for each window
+    if not isinstance(pattern, re.Pattern):
+        return pattern.search(string)
+    length = len(string)
+    for start in range(0, length, SCAN_WINDOW):
+        match = pattern.search(
+            string, start, min(start + SCAN_WINDOW + SCAN_OVERLAP, length)
+        )
+        if match is not None:
+            return match
+    return None
+
+
+def findall_windows(pattern: re.Pattern[str], string: str) -> list[Any]:
+    """Same as pattern.findall() on bounded windows of the string, each
+    match being only counted once (see search_windows())."""
+    if not isinstance(pattern, re.Pattern):
+        return pattern.findall(string)
+    results: list[Any] = []
+    start, length = 0, len(string)
+    while start < length:
+        end = min(start + SCAN_WINDOW, length)
+        last = end
+        for match in pattern.finditer(string, start, min(end + SCAN_OVERLAP, length)):
+            if match.start() >= end:
+                break
+            if pattern.groups == 0:
+                results.append(match[0])
+            elif pattern.groups == 1:
+                results.append(match[1] or "")
+            else:
+                results.append(match.groups(""))
+            last = max(last, match.end())
+        start = last
+    return results
+
+
 def trim_text(string: str) -> str:
     "Remove superfluous space and normalize remaining space."
     return " ".join(string.split())
+
+
+def element_text(elem: HtmlElement) -> str:
+    """Return the beginning of the text content of an element, long enough
+    to yield the same segment as the full text in examine_text(). Nested
+    candidates would otherwise cost as much as the size of their subtree."""
+    text, length = "", 0
+    for chunk in elem.itertext():
+        text += chunk
+        length += len("".join(chunk.split()))
+        if length >= MAX_SEGMENT_LEN:
+            break
+    return text
@@ -11,7 +11,7 @@ from datetime import datetime
 from functools import lru_cache
 
 from .settings import CACHE_SIZE, MIN_DATE
-from .utils import Extractor
+from .utils import Extractor, findall_windows
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.debug("minimum date setting: %s", MIN_DATE)
@@ -105,15 +105,20 @@ def plausible_year_filter(
     earliest: datetime,
     latest: datetime,
     incomplete: bool = False,
+    guarded: bool = False,
 ) -> Counter[str]:
     """Filter the date patterns to find plausible years only"""
-    occurrences = Counter(pattern.findall(htmlstring))  # slow!
+    debug = LOGGER.isEnabledFor(logging.DEBUG)
+    occurrences = Counter(
+        findall_windows(pattern, htmlstring) if guarded else pattern.findall(htmlstring)
+    )  # slow!
     min_year, max_year = earliest.year, latest.year
 
     for item in list(occurrences):  # prevent RuntimeError
         year_match = yearpat.search(item)
         if year_match is None:
-            LOGGER.debug("not a year pattern: %s", item)
+            if debug:
+                LOGGER.debug("not a year pattern: %s", item)
             del occurrences[item]
             continue
 
@@ -124,7 +129,8 @@ def plausible_year_filter(
             potential_year = correct_year(int(lastdigits))
 
         if not min_year <= potential_year <= max_year:
-            LOGGER.debug("no potential year: %s", item)
+            if debug:
+                LOGGER.debug("no potential year: %s", item)
             del occurrences[item]
 
     return occurrences
@@ -0,0 +1,312 @@
+"""
+Benchmark the extraction steps and shortcuts on the test pages.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+
+from lxml.html import tostring
+
+from htmldate import extractors
+from htmldate.core import (
+    NON_DIGITS_REGEX,
+    STAGES,
+    DocumentContext,
+    LazyElement,
+    examine_date_elements,
+    examine_header,
+    find_date,
+    logstring,
+    run_stages,
+    search_page,
+)
+from htmldate.extractors import (
+    DATE_EXPRESSIONS,
+    SLOW_PREPEND,
+    json_search,
+    try_date_expr,
+)
+from htmldate.meta import reset_caches
+from htmldate.settings import MAX_POSSIBLE_CANDIDATES, MAX_SEGMENT_LEN, MIN_SEGMENT_LEN
+from htmldate.utils import Extractor, load_html, re2, trim_text
+from htmldate.validators import get_max_date, get_min_date
+
+TEST_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def load_pages(directory):
+    "Read all HTML files in a directory of the test folder."
+    path = os.path.join(TEST_DIR, directory)
+    pages = {}
+    for filename in sorted(os.listdir(path)):
+        with open(os.path.join(path, filename), "rb") as inputf:
+            pages[filename] = inputf.read()
+    return pages
+
+
+def run_pages(pages, options, stages, repeat):
+    "Parse the pages and run the given extraction steps, return results and best time."
+    results, timings = {}, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for filename, data in pages.items():
+            tree = load_html(data)
+            if tree is None:
+                continue
+            state = DocumentContext(tree)
+            results[filename] = run_stages(state, options, stages=stages)
+        timings.append(time.perf_counter() - start)
+    return results, min(timings)
+
+
+def benchmark_cms(pages, options, repeat):
+    "Compare the generic cascade with the CMS shortcuts on pages with a known CMS."
+    cms_pages = {}
+    for filename, data in pages.items():
+        tree = load_html(data)
+        if tree is not None and DocumentContext(tree).cms is not None:
+            cms_pages[filename] = data
+    generic = tuple(stage for stage in STAGES if stage != "cms")
+    # warm-up: fill the function caches
+    run_pages(cms_pages, options, tuple(STAGES), 1)
+    expected, generic_time = run_pages(cms_pages, options, generic, repeat)
+    results, cms_time = run_pages(cms_pages, options, tuple(STAGES), repeat)
+    shortcuts, _ = run_pages(cms_pages, options, ("cms",), 1)
+    print(f"pages with a known CMS: {len(cms_pages)}/{len(pages)}")
+    print(
+        f"pages with a date at the CMS locations: {sum(1 for r in shortcuts.values() if r)}"
+    )
+    print(f"identical results: {sum(expected[k] == results[k] for k in results)}")
+    print(f"generic extraction: {generic_time:.3f}s")
+    print(f"with CMS shortcuts: {cms_time:.3f}s ({generic_time / cms_time:.2f}x)")
+
+
+def benchmark_logging(pages, repeat):
+    """Compare eager and lazy formatting of the elements passed to debug
+    statements in the default (non-verbose) logging configuration."""
+    elements = [
+        elem
+        for tree in map(load_html, pages.values())
+        if tree is not None
+        for elem in tree.iterfind(".//head/meta")
+    ]
+    logger = logging.getLogger("htmldate.core")
+
+    def run(formatter):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for elem in elements:
+                logger.debug("examining meta: %s", formatter(elem))
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    eager_time = run(logstring)
+    lazy_time = run(LazyElement)
+    print(f"debug statements on {len(elements)} meta elements")
+    print(f"eager formatting: {eager_time * 1000:.2f}ms")
+    print(f"lazy formatting: {lazy_time * 1000:.2f}ms ({eager_time / lazy_time:.1f}x)")
+
+
+def benchmark_regex(pages, repeat):
+    """Compare the RE2 engine with the re module on the patterns which scan
+    whole documents, searching all matches in the serialized pages."""
+    if re2 is None:
+        print("RE2 is not installed (pip install google-re2)")
+        return
+    documents = [
+        tostring(tree, encoding="unicode")
+        for tree in map(load_html, pages.values())
+        if tree is not None
+    ]
+    print(f"{len(documents)} documents")
+    totals = [0.0, 0.0]
+    for name, pattern in vars(extractors).items():
+        if not isinstance(pattern, re2._Regexp):  # pylint: disable=protected-access
+            continue
+        flags = 0 if pattern.options.case_sensitive else re.I
+        reference = re.compile(pattern.pattern, flags)
+        timings = [
+            best_time(compiled.findall, documents, repeat, warm=True)
+            for compiled in (reference, pattern)
+        ]
+        identical = all(reference.findall(d) == pattern.findall(d) for d in documents)
+        totals = [total + timing for total, timing in zip(totals, timings)]
+        print(
+            f"{name:20} re {timings[0] * 1000:9.2f}ms RE2 {timings[1] * 1000:9.2f}ms "
+            f"({timings[0] / timings[1]:.1f}x){'' if identical else ' DIFFERENT'}"
+        )
+    print(
+        f"total: re {totals[0]:.3f}s RE2 {totals[1]:.3f}s ({totals[0] / totals[1]:.1f}x)"
+    )
+
+
+def best_time(func, items, repeat, warm=False):
+    """Apply the function to all items and return the best time over several
+    runs, the caches being reset before each run unless warm is True."""
+    if warm:
+        for item in items:
+            func(item)
+    timings = []
+    for _ in range(repeat):
+        if not warm:
+            reset_caches()
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def collect_segments(trees, expression, options):
+    """Gather the text segments passed to try_date_expr() by
+    examine_date_elements(), i.e. until a date is found in a document."""
+    segments = []
+    for tree in trees:
+        for elem in tree.xpath(expression)[:MAX_POSSIBLE_CANDIDATES]:
+            text = trim_text(elem.text_content())
+            if len(text) <= MIN_SEGMENT_LEN:
+                continue
+            segments.append(NON_DIGITS_REGEX.sub("", text[:MAX_SEGMENT_LEN]))
+            if try_date_expr(
+                segments[-1],
+                options.format,
+                options.extensive,
+                options.min,
+                options.max,
+            ):
+                break
+    return segments
+
+
+def benchmark_suite(directories, options, repeat):
+    """Time the main extraction functions separately on each test directory,
+    as well as the whole extraction with cold and warm caches."""
+    expression = SLOW_PREPEND + DATE_EXPRESSIONS
+    results = {}
+    for directory in directories:
+        pages = list(load_pages(directory).values())
+        trees = [tree for tree in map(load_html, pages) if tree is not None]
+        states = [DocumentContext(tree, copy_tree=True) for tree in trees]
+        search_trees = [state.search_tree for state in states]
+        htmlstrings = [state.htmlstring for state in states]
+        segments = collect_segments(search_trees, expression, options)
+        results[directory] = {
+            "load_html": best_time(load_html, pages, repeat),
+            "examine_header": best_time(
+                lambda tree: examine_header(tree, options), trees, repeat
+            ),
+            "json_search": best_time(
+                lambda tree: json_search(tree, options), trees, repeat
+            ),
+            "examine_date_elements": best_time(
+                lambda tree: examine_date_elements(tree, expression, options),
+                search_trees,
+                repeat,
+            ),
+            "search_page": best_time(
+                lambda htmlstring: search_page(htmlstring, options),
+                htmlstrings,
+                repeat,
+            ),
+            "try_date_expr": best_time(
+                lambda text: try_date_expr(
+                    text,
+                    options.format,
+                    options.extensive,
+                    options.min,
+                    options.max,
+                ),
+                segments,
+                repeat,
+            ),
+            "find_date_cold": best_time(
+                lambda page: find_date(page, original_date=options.original),
+                pages,
+                repeat,
+            ),
+            "find_date_warm": best_time(
+                lambda page: find_date(page, original_date=options.original),
+                pages,
+                repeat,
+                warm=True,
+            ),
+        }
+        for name, value in results[directory].items():
+            print(f"{directory:10} {name:22} {value * 1000:10.2f}ms")
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    "Compare the timings with a baseline and list those which are slower."
+    regressions = []
+    for directory, timings in results.items():
+        for name, value in timings.items():
+            reference = baseline.get(directory, {}).get(name)
+            if reference and value > reference * (1 + threshold):
+                regressions.append((directory, name, reference, value))
+    return regressions
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run the benchmark")
+    PARSER.add_argument(
+        "--dir", help="Test directory: cache (default), eval or test_set"
+    )
+    PARSER.add_argument("--original", action="store_true", help="Original date")
+    PARSER.add_argument("--repeat", type=int, default=5, help="Number of runs")
+    PARSER.add_argument(
+        "--logging", action="store_true", help="Measure the logging overhead"
+    )
+    PARSER.add_argument(
+        "--regex", action="store_true", help="Compare the RE2 and re engines"
+    )
+    PARSER.add_argument(
+        "--suite",
+        action="store_true",
+        help="Time the extraction functions (on cache, test_set and eval by default)",
+    )
+    PARSER.add_argument("--output", help="Write the suite results to a JSON file")
+    PARSER.add_argument("--baseline", help="Compare with results stored in a JSON file")
+    PARSER.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown reported as a regression (default: 0.2)",
+    )
+    ARGS = PARSER.parse_args()
+
+    OPTIONS = Extractor(
+        True, get_max_date(None), get_min_date(None), ARGS.original, "%Y-%m-%d"
+    )
+    if ARGS.suite:
+        DIRECTORIES = (ARGS.dir,) if ARGS.dir else ("cache", "test_set", "eval")
+        RESULTS = benchmark_suite(DIRECTORIES, OPTIONS, ARGS.repeat)
+        if ARGS.output:
+            with open(ARGS.output, "w", encoding="utf-8") as outputfile:
+                json.dump(
+                    {"python": platform.python_version(), "results": RESULTS},
+                    outputfile,
+                    indent=2,
+                )
+        if ARGS.baseline:
+            with open(ARGS.baseline, "r", encoding="utf-8") as inputfile:
+                BASELINE = json.load(inputfile)["results"]
+            REGRESSIONS = find_regressions(RESULTS, BASELINE, ARGS.threshold)
+            for directory, name, reference, value in REGRESSIONS:
+                print(
+                    f"regression: {directory} {name} {reference * 1000:.2f}ms -> {value * 1000:.2f}ms"
+                )
+            sys.exit(1 if REGRESSIONS else 0)
+    elif ARGS.regex:
+        benchmark_regex(load_pages(ARGS.dir or "eval"), ARGS.repeat)
+    elif ARGS.logging:
+        benchmark_logging(load_pages(ARGS.dir or "cache"), ARGS.repeat)
+    else:
+        benchmark_cms(load_pages(ARGS.dir or "cache"), OPTIONS, ARGS.repeat)
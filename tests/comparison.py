@@ -4,8 +4,13 @@ Compare extraction results with other libraries of the same kind.
 
 import argparse
 import contextlib
+import os
+import pickle
 import sys
 import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor
 
 import tqdm
 
@@ -26,20 +31,6 @@ from evaluation import (
 )
 
 
-PARSER = argparse.ArgumentParser(description="Run the evaluation")
-PARSER.add_argument(
-    "--small",
-    action="store_true",
-    help="Only take htmldate into account",
-)
-PARSER.add_argument(
-    "--verbose",
-    action="store_true",
-    help="Increase verbosity",
-)
-ARGS = PARSER.parse_args()
-
-
 TEMPLATE_DICT = {
     "true_positives": 0,
     "false_positives": 0,
@@ -51,22 +42,60 @@ TEMPLATE_DICT = {
 FUNC_DICT = {
     "htmldate_extensive": run_htmldate_extensive,
     "htmldate_fast": run_htmldate_fast,
+    "newspaper": run_newspaper,
+    "newsplease": run_newsplease,
+    "articledateextractor": run_articledateextractor,
+    "date_guesser": run_dateguesser,
+    "goose": run_goose,
 }
-if not ARGS.small:
-    FUNC_DICT.update(
-        {
-            "newspaper": run_newspaper,
-            "newsplease": run_newsplease,
-            "articledateextractor": run_articledateextractor,
-            "date_guesser": run_dateguesser,
-            "goose": run_goose,
-        }
-    )
-
-RESULTS_DICT = {key: TEMPLATE_DICT.copy() for key in FUNC_DICT}
-
-
-def calculate_scores(name, mydict):
+SMALL = ("htmldate_extensive", "htmldate_fast")
+
+
+def load_documents(cachefile=None):
+    """Read and decode all evaluation documents, store the result in a cache
+    file if given so that the encodings don't have to be detected again."""
+    if cachefile and os.path.isfile(cachefile):
+        with open(cachefile, "rb") as inputf:
+            return pickle.load(inputf)
+    documents = {
+        data["file"]: load_document(data["file"]) for data in EVAL_PAGES.values()
+    }
+    if cachefile:
+        with open(cachefile, "wb") as outputf:
+            pickle.dump(documents, outputf)
+    return documents
+
+
+def run_document(args):
+    """Run each function in the benchmark on a document, return the results,
+    the time taken and the peak memory allocated (if required)."""
+    filename, htmlstring, names, verbose, memory = args
+    outcomes = {}
+    for name in names:
+        with (
+            contextlib.redirect_stdout(sys.stdout if verbose else None),
+            contextlib.redirect_stderr(sys.stderr if verbose else None),
+        ):
+            start = time.perf_counter()
+            result = FUNC_DICT[name](htmlstring)
+            duration = time.perf_counter() - start
+            peak = None
+            # separate run: tracing allocations slows down the execution
+            if memory:
+                tracemalloc.start()
+                FUNC_DICT[name](htmlstring)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        outcomes[name] = (result, duration, peak)
+    return filename, outcomes
+
+
+def percentile(values, share):
+    "Return the value below which a given share of the sorted values falls."
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def calculate_scores(name, mydict, results_dict):
     "Output weighted result score."
     tp, fn, fp, tn = (
         mydict["true_positives"],
@@ -74,8 +103,8 @@ def calculate_scores(name, mydict):
         mydict["false_positives"],
         mydict["true_negatives"],
     )
-    time1 = f'{mydict["time"] / RESULTS_DICT["htmldate_extensive"]["time"] :.2f}x'
-    time2 = f'{mydict["time"] / RESULTS_DICT["htmldate_fast"]["time"] :.2f}x'
+    time1 = f'{mydict["time"] / results_dict["htmldate_extensive"]["time"] :.2f}x'
+    time2 = f'{mydict["time"] / results_dict["htmldate_fast"]["time"] :.2f}x'
     precision = tp / (tp + fp)
     recall = tp / (tp + fn)
     accuracy = (tp + tn) / (tp + tn + fp + fn)
@@ -83,34 +112,96 @@ def calculate_scores(name, mydict):
     return name, precision, recall, accuracy, fscore, mydict["time"], time1, time2
 
 
-def run_eval(html, data):
-    "Run the evaluation with each function in the benchmark."
-    for function_name, func in FUNC_DICT.items():
-        start = time.time()
-        result = func(html)
-        RESULTS_DICT[function_name]["time"] += time.time() - start
-
-        tp, fp, tn, fn = evaluate_result(result, data)
-        RESULTS_DICT[function_name]["true_positives"] += tp
-        RESULTS_DICT[function_name]["false_positives"] += fp
-        RESULTS_DICT[function_name]["true_negatives"] += tn
-        RESULTS_DICT[function_name]["false_negatives"] += fn
+def calculate_latencies(name, timings, peaks):
+    "Output the latency distribution (ms) and peak memory (MiB) per document."
+    timings = sorted(timings)
+    row = [name] + [1000 * percentile(timings, share) for share in (0.5, 0.95, 0.99)]
+    row.append(1000 * timings[-1])
+    if peaks:
+        peaks = sorted(peaks)
+        row += [percentile(peaks, 0.5) / 2**20, peaks[-1] / 2**20]
+    return row
 
 
 if __name__ == "__main__":
-
-    # hack to suppress noise
-    my_stdout = sys.stdout if ARGS.verbose else None
-    my_stderr = sys.stderr if ARGS.verbose else None
-
-    for item, data in tqdm.tqdm(EVAL_PAGES.items(), total=len(EVAL_PAGES)):
-        htmlstring = load_document(data["file"])
-        with contextlib.redirect_stdout(my_stdout), contextlib.redirect_stderr(
-            my_stderr
+    PARSER = argparse.ArgumentParser(description="Run the evaluation")
+    PARSER.add_argument(
+        "--small",
+        action="store_true",
+        help="Only take htmldate into account",
+    )
+    PARSER.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Increase verbosity",
+    )
+    PARSER.add_argument(
+        "--parallel", type=int, default=os.cpu_count(), help="Number of processes"
+    )
+    PARSER.add_argument(
+        "--cache", help="Store the decoded documents in this file for later runs"
+    )
+    PARSER.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Don't measure the peak memory allocated per document",
+    )
+    ARGS = PARSER.parse_args()
+
+    NAMES = SMALL if ARGS.small else tuple(FUNC_DICT)
+    RESULTS_DICT = {key: TEMPLATE_DICT.copy() for key in NAMES}
+    TIMINGS = {key: [] for key in NAMES}
+    PEAKS = {key: [] for key in NAMES}
+
+    DOCUMENTS = load_documents(ARGS.cache)
+    REFERENCES = {data["file"]: data for data in EVAL_PAGES.values()}
+    TASKS = [
+        (data["file"], DOCUMENTS[data["file"]], NAMES, ARGS.verbose, not ARGS.no_memory)
+        for data in EVAL_PAGES.values()
+    ]
+
+    with ProcessPoolExecutor(max_workers=ARGS.parallel) as executor:
+        for filename, outcomes in tqdm.tqdm(
+            executor.map(run_document, TASKS, chunksize=4), total=len(TASKS)
         ):
-            run_eval(htmlstring, data)
-
-    table = [calculate_scores(key, value) for key, value in RESULTS_DICT.items()]
+            for function_name, (result, duration, peak) in outcomes.items():
+                RESULTS_DICT[function_name]["time"] += duration
+                TIMINGS[function_name].append((duration, filename, peak))
+                if peak is not None:
+                    PEAKS[function_name].append(peak)
+                tp, fp, tn, fn = evaluate_result(result, REFERENCES[filename])
+                RESULTS_DICT[function_name]["true_positives"] += tp
+                RESULTS_DICT[function_name]["false_positives"] += fp
+                RESULTS_DICT[function_name]["true_negatives"] += tn
+                RESULTS_DICT[function_name]["false_negatives"] += fn
+
+    table = [
+        calculate_scores(key, value, RESULTS_DICT)
+        for key, value in RESULTS_DICT.items()
+    ]
+    latencies = [
+        calculate_latencies(key, [t[0] for t in TIMINGS[key]], PEAKS[key])
+        for key in NAMES
+    ]
+    latency_headers = ["Name", "p50 (ms)", "p95 (ms)", "p99 (ms)", "max (ms)"]
+    if not ARGS.no_memory:
+        latency_headers += ["Mem. p50 (MiB)", "Mem. max (MiB)"]
+
+    slowest = []
+    for key in NAMES:
+        slowest.append(f"Slowest documents: {key}")
+        rows = sorted(TIMINGS[key], reverse=True)[:20]
+        slowest.append(
+            tabulate(
+                [
+                    (filename, 1000 * duration, peak / 2**20 if peak else None)
+                    for duration, filename, peak in rows
+                ],
+                headers=["File", "Time (ms)", "Peak memory (MiB)"],
+                floatfmt=".2f",
+            )
+        )
+        slowest.append("")
 
     print()
     print(
@@ -121,6 +212,9 @@ if __name__ == "__main__":
         )
     )
     print()
+    print(tabulate(latencies, headers=latency_headers, floatfmt=".2f"))
+    print()
+    print("\n".join(slowest))
 
     with open("comparison_results.txt", "w", encoding="utf-8") as f:
         print(
@@ -140,5 +234,9 @@ if __name__ == "__main__":
             ),
             file=f,
         )
+        print(file=f)
+        print(tabulate(latencies, headers=latency_headers, floatfmt=".2f"), file=f)
+        print(file=f)
+        print("\n".join(slowest), file=f)
 
     print("Results also saved as comparison_results.txt")
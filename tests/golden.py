@@ -0,0 +1,117 @@
+"""
+Compare the output of htmldate on the test pages with a stored snapshot,
+to make sure that refactorings and optimizations don't change the results.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from htmldate import find_date
+
+
+TEST_DIR = os.path.abspath(os.path.dirname(__file__))
+SNAPSHOT = os.path.join(TEST_DIR, "golden.json")
+# fixed upper boundary, the results would otherwise depend on the current date
+MAX_DATE = "2025-01-01"
+# (original_date, extensive_search)
+COMBINATIONS = {
+    "original-extensive": (True, True),
+    "original-fast": (True, False),
+    "updated-extensive": (False, True),
+    "updated-fast": (False, False),
+}
+
+
+def list_documents(directories):
+    "List the HTML files in the given directories of the test folder."
+    return [
+        f"{directory}/{filename}"
+        for directory in directories
+        for filename in sorted(os.listdir(os.path.join(TEST_DIR, directory)))
+    ]
+
+
+def run_document(document):
+    "Extract the date of a document with all combinations of options."
+    logging.disable(logging.CRITICAL)
+    with open(os.path.join(TEST_DIR, *document.split("/")), "rb") as inputf:
+        data = inputf.read()
+    results = {}
+    for name, (original, extensive) in COMBINATIONS.items():
+        try:
+            results[name] = find_date(
+                data,
+                original_date=original,
+                extensive_search=extensive,
+                max_date=MAX_DATE,
+            )
+        except Exception as err:  # report, don't stop
+            results[name] = f"error: {type(err).__name__}"
+    return document, results
+
+
+def run_all(documents, processes=None):
+    "Process the documents in parallel and return the results."
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return dict(executor.map(run_document, documents, chunksize=8))
+
+
+def compare(snapshot, results):
+    "List the differences as tuples (document, combination, expected, found)."
+    differences = []
+    for document in sorted(set(snapshot) | set(results)):
+        expected, found = snapshot.get(document, {}), results.get(document, {})
+        for name in COMBINATIONS:
+            if expected.get(name) != found.get(name):
+                differences.append(
+                    (document, name, expected.get(name), found.get(name))
+                )
+    return differences
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(
+        description="Check the results against the stored snapshot"
+    )
+    PARSER.add_argument(
+        "--dirs",
+        nargs="+",
+        default=["eval", "cache"],
+        help="Test directories (default: eval cache)",
+    )
+    PARSER.add_argument(
+        "--update", action="store_true", help="Write a new snapshot instead"
+    )
+    PARSER.add_argument("--snapshot", default=SNAPSHOT, help="Snapshot file")
+    PARSER.add_argument("--processes", type=int, help="Number of processes")
+    ARGS = PARSER.parse_args()
+
+    RESULTS = run_all(list_documents(ARGS.dirs), ARGS.processes)
+
+    if ARGS.update:
+        with open(ARGS.snapshot, "w", encoding="utf-8") as outputfile:
+            json.dump(RESULTS, outputfile, indent=1, sort_keys=True)
+            outputfile.write("\n")
+        print(f"snapshot written: {len(RESULTS)} documents")
+        sys.exit(0)
+
+    with open(ARGS.snapshot, "r", encoding="utf-8") as inputfile:
+        # only compare the documents which have been processed
+        SNAPSHOT_RESULTS = {
+            document: values
+            for document, values in json.load(inputfile).items()
+            if document.split("/")[0] in ARGS.dirs
+        }
+    DIFFERENCES = compare(SNAPSHOT_RESULTS, RESULTS)
+    for document, name, expected, found in DIFFERENCES:
+        print(f"{document} [{name}]: {expected} -> {found}")
+    print(
+        f"{len(RESULTS)} documents, {len(DIFFERENCES)} differences "
+        f"in {len({d[0] for d in DIFFERENCES})} documents"
+    )
+    sys.exit(1 if DIFFERENCES else 0)
@@ -0,0 +1,92 @@
+"""
+Time the regular expressions of htmldate on adversarial inputs to detect
+patterns whose cost grows faster than the size of the input (ReDoS).
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from htmldate import core, extractors, utils
+from htmldate.utils import findall_windows
+
+
+# inputs designed to trigger backtracking in the patterns
+ADVERSARIAL_INPUTS = {
+    "copyright_signs": lambda n: "©" * n,
+    "copyright_words": lambda n: "Copyright " * (n // 10),
+    "copyright_gap": lambda n: "Copyright " + "a" * n,
+    "spaces_after_keyword": lambda n: "güncelleme" + " " * n + "x",
+    "repeated_keywords": lambda n: ("güncelleme tarihi : " + " " * 30) * (n // 50),
+    "spaces_after_date": lambda n: "1.1.11" + " " * n,
+    "date_words": lambda n: "date " * (n // 5),
+    "colons_after_on": lambda n: "on" + " :" * (n // 2),
+    "digits": lambda n: "1" * n,
+    "digits_and_dots": lambda n: "1." * (n // 2),
+    "digits_and_dashes": lambda n: "12-" * (n // 3),
+    "digits_and_slashes": lambda n: "12/" * (n // 3),
+    "months": lambda n: "March 1 " * (n // 8),
+    "day_of": lambda n: "1st of " * (n // 7),
+    "year_ranges": lambda n: "2019-" * (n // 5),
+    "json_keys": lambda n: '"datePublished": "' * (n // 18),
+    "open_tags": lambda n: "<svg" * (n // 4),
+}
+# tolerated deviation from linear growth
+SLACK = 2.0
+
+
+def list_patterns():
+    "Collect the compiled regular expressions of the extraction modules."
+    patterns = {}
+    for module in (extractors, core, utils):
+        for name, value in vars(module).items():
+            # including the patterns compiled with RE2
+            if isinstance(value, re.Pattern) or hasattr(value, "possiblematchrange"):
+                patterns.setdefault(name, value)
+    return patterns
+
+
+def time_pattern(pattern, text, guarded=False):
+    "Return the time needed to find all matches in the text."
+    start = time.perf_counter()
+    if guarded:
+        findall_windows(pattern, text)
+    else:
+        pattern.findall(text)
+    return time.perf_counter() - start
+
+
+def audit(sizes=(2000, 8000), guarded=False):
+    """Time each pattern on each adversarial input at two sizes and return
+    the results as tuples (pattern, input, time, growth relative to size)."""
+    results = []
+    for pattern_name, pattern in list_patterns().items():
+        for input_name, generator in ADVERSARIAL_INPUTS.items():
+            timings = [
+                time_pattern(pattern, generator(size), guarded) for size in sizes
+            ]
+            growth = (timings[1] / max(timings[0], 1e-6)) / (sizes[1] / sizes[0])
+            results.append((pattern_name, input_name, timings[1], growth))
+    return sorted(results, key=lambda item: item[2], reverse=True)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run the regex audit")
+    PARSER.add_argument(
+        "--size", type=int, default=8000, help="Input size in characters"
+    )
+    PARSER.add_argument(
+        "--guarded", action="store_true", help="Scan in bounded windows"
+    )
+    PARSER.add_argument("--top", type=int, default=20, help="Number of results")
+    ARGS = PARSER.parse_args()
+
+    RESULTS = audit((ARGS.size // 4, ARGS.size), ARGS.guarded)
+    for PATTERN, INPUT, TIMING, GROWTH in RESULTS[: ARGS.top]:
+        print(f"{PATTERN:22} {INPUT:22} {TIMING * 1000:10.2f}ms {GROWTH:6.2f}")
+    # only flag significant timings, small ones are dominated by noise
+    SUSPECTS = [r for r in RESULTS if r[3] > SLACK and r[2] > 0.01]
+    for PATTERN, INPUT, _, GROWTH in SUSPECTS:
+        print(f"superlinear: {PATTERN} on {INPUT} ({GROWTH:.1f})")
+    sys.exit(1 if SUSPECTS else 0)
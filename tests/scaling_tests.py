@@ -0,0 +1,163 @@
+"""
+Scaling tests for the htmldate library: processing time has to grow
+linearly with the size of synthetic documents.
+"""
+
+import argparse
+import logging
+import time
+
+from htmldate.core import find_date
+from htmldate.settings import MAX_FILE_SIZE
+
+
+HEAD = "<html><head><title>Synthetic page</title></head><body>"
+TAIL = "</body></html>"
+# tolerated deviation from linear growth (timing noise, constant costs)
+SLACK = 2.0
+
+
+def fill(size, unit):
+    "Repeat a unit of markup until the page reaches the given size."
+    parts, total, i = [], len(HEAD) + len(TAIL), 0
+    while total < size:
+        parts.append(unit(i))
+        total += len(parts[-1])
+        i += 1
+    return "".join(parts)
+
+
+def nested_blocks(size):
+    "Blocks of nested div elements."
+    return (
+        HEAD
+        + fill(size, lambda i: "<div>" * 50 + f"<p>Paragraph {i}</p>" + "</div>" * 50)
+        + TAIL
+    )
+
+
+def nested_candidates(size):
+    """Date candidates nested in each other, the nesting growing with the size
+    (up to a depth which the parser accepts)."""
+    depth = min(size // 2000, 200)
+    start, end = '<div class="date">x ' * depth, "</div>" * depth
+    text = fill(
+        size - len(start) - len(end), lambda i: f"<p>Some words, number {i}.</p>"
+    )
+    return HEAD + start + text + end + TAIL
+
+
+def time_elements(size):
+    "Thousands of time and abbr elements without a usable date."
+    return (
+        HEAD
+        + fill(
+            size,
+            lambda i: (
+                f'<p><time>{i % 97} min.</time> <abbr title="n. {i}">{i}</abbr></p>'
+            ),
+        )
+        + TAIL
+    )
+
+
+def digit_tables(size):
+    "Tables full of numbers resembling date components."
+    return (
+        HEAD
+        + "<table>"
+        + fill(
+            size,
+            lambda i: (
+                f"<tr><td>{i * 7919 % 100000}</td><td>{i * 31 % 97}.{i % 13}.{i % 89}</td></tr>"
+            ),
+        )
+        + "</table>"
+        + TAIL
+    )
+
+
+def inline_script(size):
+    "A huge inline script full of numbers."
+    return (
+        HEAD
+        + "<script>"
+        + fill(
+            size,
+            lambda i: (
+                f"var a{i}=[{i * 13 % 9999},'{i % 31}-{i % 12}-{1000 + i % 9000}'];"
+            ),
+        )
+        + "</script><p>Text</p>"
+        + TAIL
+    )
+
+
+GENERATORS = {
+    "nested_blocks": nested_blocks,
+    "nested_candidates": nested_candidates,
+    "time_elements": time_elements,
+    "digit_tables": digit_tables,
+    "inline_script": inline_script,
+}
+
+
+def measure(page, repeat=2):
+    "Return the best processing time over several runs."
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        find_date(page)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def scaling_ratios(generator, sizes, repeat=2):
+    """Return the processing times and, for each step, the ratio of the time
+    increase to the size increase (about 1 for linear growth)."""
+    timings = [measure(generator(size), repeat) for size in sizes]
+    ratios = [
+        (timings[i + 1] / timings[i]) / (sizes[i + 1] / sizes[i])
+        for i in range(len(sizes) - 1)
+    ]
+    return timings, ratios
+
+
+def test_generators():
+    """test the size of the synthetic pages"""
+    for generator in GENERATORS.values():
+        page = generator(10000)
+        assert 10000 <= len(page) < 11000
+        assert find_date(page, extensive_search=False) is None
+
+
+def test_linear_scaling():
+    """test that processing time grows linearly with the document size"""
+    logging.disable(logging.CRITICAL)
+    try:
+        for name, generator in GENERATORS.items():
+            _, ratios = scaling_ratios(generator, (20000, 80000, 320000))
+            assert all(ratio < SLACK for ratio in ratios), (name, ratios)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Run the scaling tests")
+    PARSER.add_argument(
+        "--max",
+        type=int,
+        default=MAX_FILE_SIZE,
+        help="Maximum page size (default: MAX_FILE_SIZE)",
+    )
+    ARGS = PARSER.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    SIZES = [10000]
+    while SIZES[-1] * 4 <= ARGS.max:
+        SIZES.append(SIZES[-1] * 4)
+    for NAME, GENERATOR in GENERATORS.items():
+        TIMINGS, RATIOS = scaling_ratios(GENERATOR, SIZES, repeat=1)
+        print(NAME)
+        for SIZE, TIMING, RATIO in zip(SIZES, TIMINGS, [None] + RATIOS):
+            print(f"  {SIZE:>10} bytes {TIMING:8.3f}s", f"{RATIO:.2f}" if RATIO else "")
@@ -5,14 +5,19 @@ Unit tests for the htmldate library.
 
 
 import datetime
+import gzip
 import io
 import logging
 import os
 import re
 import sys
+import tempfile
+import time
 
 from collections import Counter
-from contextlib import redirect_stdout
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
 from unittest.mock import Mock, patch
 
 import pytest
@@ -20,31 +25,71 @@ import pytest
 from lxml import html
 from lxml.etree import XPathEvalError
 
+from htmldate import extractors, utils
+from htmldate.cache import HTTPCache, ResultCache
 from htmldate.cli import cli_examine, main, parse_args, process_args
 from htmldate.core import (
+    DATE_ELEMENTS,
+    DateField,
+    DocumentContext,
+    LazyElement,
     compare_reference,
     examine_date_elements,
+    examine_http_headers,
+    extract_date_metadata,
     find_date,
+    find_date_candidates,
+    find_date_in_text,
+    find_dates_from_urls,
+    find_dates,
+    load_context,
+    logstring,
     search_page,
     search_pattern,
     select_candidate,
 )
 from htmldate.extractors import (
+    COPYRIGHT_PATTERN,
+    LONG_TEXT_PATTERN,
+    TEXT_PATTERNS,
+    cms_search,
     custom_parse,
+    detect_cms,
     discard_unwanted,
     external_date_parser,
+    extract_url_date,
+    json_search,
     regex_parse,
+    state_search,
     try_date_expr,
 )
-from htmldate.meta import reset_caches
-from htmldate.settings import MIN_DATE
+from htmldate.feeds import find_feed_dates
+from htmldate.meta import CACHED_FUNCTIONS, cache_stats, reset_caches
+from htmldate.metrics import METRICS, MetricsRegistry
+from htmldate.routing import StageRouter, get_domain
+from htmldate.settings import (
+    HEAD_PROBE_SIZE,
+    MAX_SEGMENT_LEN,
+    MIN_DATE,
+    SCAN_OVERLAP,
+    SCAN_WINDOW,
+)
+from htmldate.trace import Trace
 from htmldate.utils import (
     Extractor,
+    compile_pattern,
     decode_response,
+    element_text,
+    fetch_head,
+    fetch_response,
     fetch_url,
+    findall_windows,
     is_dubious_html,
     load_html,
+    mask_html,
     repair_faulty_html,
+    search_windows,
+    trim_text,
 )
 from htmldate.validators import (
     convert_date,
@@ -65,6 +110,51 @@ OPTIONS = Extractor(True, LATEST_POSSIBLE, MIN_DATE, True, OUTPUTFORMAT)
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
 
+@contextmanager
+def local_server(pages, honor_range=True, headers=None):
+    """Serve the given pages (path -> bytes) on localhost with optional
+    headers, record the requests and answer range requests if required."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, dict(self.headers)))
+            if self.path not in pages:
+                self.send_error(404)
+                return
+            body = pages[self.path]
+            etag = (headers or {}).get("ETag")
+            if etag and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            match = re.match(r"bytes=0-(\d+)", self.headers.get("Range", ""))
+            if honor_range and match:
+                end = min(int(match[1]), len(body) - 1)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes 0-{end}/{len(body)}")
+                body = body[: end + 1]
+            else:
+                self.send_response(200)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 def test_input():
     """test if loaded strings/trees are handled properly"""
     assert is_dubious_html("This is a string.") is True
@@ -1648,6 +1738,1081 @@ def test_download():
     assert cli_examine(teststring, args) is None
 
 
+def test_head_probe():
+    """test partial download of the beginning of documents"""
+    head = b'<html><head><meta name="date" content="2017-09-01"/></head><body>'
+    late = b'<html><head></head><body><div class="date">2017-09-01</div>'
+    filler = b"<p>" + b"Lorem ipsum dolor sit amet. " * 5000 + b"</p>"
+    pages = {
+        "/head.html": head + filler + b"</body></html>",
+        "/late.html": late + filler + b"</body></html>",
+        "/deep.html": b"<html><body>" + filler + late + b"</body></html>",
+        "/small.html": late + b"</body></html>",
+    }
+    with local_server(pages) as (base, requests):
+        # partial content
+        prefix, complete = fetch_head(base + "/head.html")
+        assert complete is False and prefix.endswith(">")
+        assert len(prefix) <= HEAD_PROBE_SIZE
+        prefix, complete = fetch_head(base + "/small.html")
+        assert complete is True and prefix == pages["/small.html"].decode()
+        assert fetch_head(base + "/missing.html") == (None, False)
+        requests.clear()
+        # date in header: a single partial download is enough
+        assert find_date(base + "/head.html", head_probe=True) == "2017-09-01"
+        assert [r[1].get("Range") for r in requests] == [
+            f"bytes=0-{HEAD_PROBE_SIZE - 1}"
+        ]
+        requests.clear()
+        # date further down: fall back on the whole document
+        assert find_date(base + "/late.html", head_probe=True) == "2017-09-01"
+        assert find_date(base + "/deep.html", head_probe=True) == "2017-09-01"
+        assert len(requests) == 4 and "Range" not in requests[-1][1]
+        requests.clear()
+        # the whole document fits in the prefix: no second download
+        assert find_date(base + "/small.html", head_probe=True) == "2017-09-01"
+        assert len(requests) == 1
+    # server ignoring range requests
+    with local_server(pages, honor_range=False) as (base, requests):
+        assert fetch_head(base + "/small.html")[1] is True
+        requests.clear()
+        assert find_date(base + "/deep.html", head_probe=True) == "2017-09-01"
+        assert len(requests) == 1
+
+
+def test_http_headers():
+    """test the use of HTTP response headers"""
+    static = {
+        "Date": "Wed, 04 Oct 2023 10:00:00 GMT",
+        "Last-Modified": "Tue, 21 Feb 2017 07:28:00 GMT",
+    }
+    dynamic = {
+        "date": "Wed, 04 Oct 2023 10:00:00 GMT",
+        "last-modified": "Wed, 04 Oct 2023 10:00:00 GMT",
+    }
+    assert examine_http_headers(static, OPTIONS) == "2017-02-21"
+    assert examine_http_headers({"last-modified": static["Last-Modified"]}, OPTIONS)
+    assert examine_http_headers(dynamic, OPTIONS) is None
+    assert examine_http_headers({"Date": static["Date"]}, OPTIONS) is None
+    assert examine_http_headers({"Last-Modified": "yesterday"}, OPTIONS) is None
+    # offsets are converted to UTC
+    assert (
+        examine_http_headers(
+            {"Last-Modified": "Tue, 21 Feb 2017 01:00:00 +0200"}, OPTIONS
+        )
+        == "2017-02-20"
+    )
+    assert (
+        examine_http_headers(
+            {"Last-Modified": "Sun, 01 Jan 1984 00:00:00 GMT"}, OPTIONS
+        )
+        is None
+    )
+
+    htmlstring = (
+        '<html><head><meta name="date" content="2016-07-12"/></head><body/></html>'
+    )
+    # updated date: the header is enough, the document is not even parsed
+    assert find_date(htmlstring, headers=static) == "2017-02-21"
+    assert find_date(b"", headers=static) == "2017-02-21"
+    assert find_date(htmlstring, headers=dynamic) == "2016-07-12"
+    # original date: reserve candidate
+    assert find_date(htmlstring, headers=static, original_date=True) == "2016-07-12"
+    nodate = "<html><head></head><body><p>Nothing to see here.</p></body></html>"
+    assert find_date(nodate, original_date=True) is None
+    assert find_date(nodate, headers=static, original_date=True) == "2017-02-21"
+    assert (
+        find_date(nodate, headers=static, outputformat="%d %B %Y") == "21 February 2017"
+    )
+
+    # headers returned by the download utility
+    with local_server({"/page.html": htmlstring.encode()}, headers=static) as (base, _):
+        response = fetch_response(base + "/page.html")
+        assert response.data == htmlstring and response.status == 200
+        assert response.headers["last-modified"] == static["Last-Modified"]
+        assert find_date(response.data, headers=response.headers) == "2017-02-21"
+        assert fetch_url(base + "/page.html") == htmlstring
+        assert fetch_response(base + "/missing.html") is None
+
+
+def test_http_cache():
+    """test conditional requests and cached dates"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = HTTPCache(tmpdir)
+        pages = {
+            "/page.html": b'<html><head><meta name="date" content="2016-07-12"/></head><body/></html>',
+            "/other.html": b"<html><body><p>Nothing to see here.</p></body></html>",
+        }
+        # last modification after the response: dynamic page, header discarded
+        headers = {"ETag": '"v1"', "Last-Modified": "Tue, 21 Feb 2090 07:28:00 GMT"}
+        with local_server(pages, headers=headers) as (base, requests):
+            url = base + "/page.html"
+            assert cache.conditional_headers(url) == {}
+            # first crawl: full download and extraction
+            assert find_date(url, http_cache=cache) == "2016-07-12"
+            assert "If-None-Match" not in requests[-1][1]
+            assert cache.conditional_headers(url) == {
+                "If-None-Match": '"v1"',
+                "If-Modified-Since": headers["Last-Modified"],
+            }
+            # recrawl: not modified, cached date
+            requests.clear()
+            assert find_date(url, http_cache=cache) == "2016-07-12"
+            assert len(requests) == 1 and requests[0][1]["If-None-Match"] == '"v1"'
+            # other options: no cached date, single plain download, keep both
+            requests.clear()
+            assert find_date(url, http_cache=cache, outputformat="%d %B %Y") == (
+                "12 July 2016"
+            )
+            assert len(requests) == 1 and "If-None-Match" not in requests[0][1]
+            assert len(cache.get(url)["dates"]) == 2
+            # absence of results is also stored
+            other = base + "/other.html"
+            assert find_date(other, http_cache=cache, extensive_search=False) is None
+            requests.clear()
+            assert find_date(other, http_cache=cache, extensive_search=False) is None
+            assert len(requests) == 1
+            # errors
+            with pytest.raises(ValueError):
+                find_date(base + "/missing.html", http_cache=cache)
+        # modified document: stored dates are discarded
+        pages["/page.html"] = pages["/page.html"].replace(b"2016", b"2018")
+        headers["ETag"] = '"v2"'
+        with local_server(pages, headers=headers) as (base, _):
+            cache.store(base + "/page.html", {"etag": '"v1"'}, "key", "2016-07-12")
+            assert find_date(base + "/page.html", http_cache=cache) == "2018-07-12"
+            assert list(cache.get(base + "/page.html")["dates"]) != ["key"]
+        # headers of the response, the ones passed as argument come first
+        headers["Last-Modified"] = "Tue, 21 Feb 2017 07:28:00 GMT"
+        with local_server(pages, headers=headers) as (base, requests):
+            other = base + "/other.html"
+            assert find_date(other, http_cache=cache) == "2017-02-21"
+            assert (
+                find_date(
+                    other,
+                    http_cache=HTTPCache(tmpdir + "/other"),
+                    headers={"last-modified": "Mon, 20 Feb 2017 07:28:00 GMT"},
+                )
+                == "2017-02-20"
+            )
+            # no partial download: the whole document is needed
+            requests.clear()
+            assert find_date(other, http_cache=cache, head_probe=True) == "2017-02-21"
+            assert all("Range" not in request[1] for request in requests)
+        # corrupted entries
+        with open(cache._path("https://example.org"), "w", encoding="utf-8") as f:
+            f.write("{")
+        assert cache.get("https://example.org") is None
+
+
+def test_result_cache():
+    """test the memoization of results for identical documents"""
+    htmlstring = (
+        '<html><body><span class="entry-date">12. Juli 2016</span></body></html>'
+    )
+    cache = ResultCache(maxsize=2)
+    assert cache.find_date(htmlstring) == "2016-07-12"
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.find_date(htmlstring) == "2016-07-12"
+    # same content as bytes
+    assert cache.find_date(htmlstring.encode("utf-8")) == "2016-07-12"
+    assert (cache.hits, cache.misses) == (2, 1)
+    # options are part of the key
+    assert cache.find_date(htmlstring, outputformat="%d %B %Y") == "12 July 2016"
+    assert cache.find_date(htmlstring, max_date="2015-12-31") is None
+    assert cache.find_date(htmlstring, max_date="2015-12-31") is None
+    assert (cache.hits, cache.misses, len(cache)) == (3, 3, 2)
+    # trees are not cached
+    assert cache.find_date(html.fromstring(htmlstring)) == "2016-07-12"
+    assert (cache.hits, cache.misses) == (3, 3)
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+    # spill to disk
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResultCache(maxsize=1, directory=tmpdir)
+        assert cache.find_date(htmlstring) == "2016-07-12"
+        assert cache.find_date("<html><body><p>Test</p></body></html>") is None
+        assert len(cache) == 1 and len(os.listdir(tmpdir)) == 1
+        with patch("htmldate.cache.find_date") as mocked:
+            assert cache.find_date(htmlstring) == "2016-07-12"
+            mocked.assert_not_called()
+        assert (cache.hits, cache.misses) == (1, 2)
+        # results shared across instances
+        assert ResultCache(directory=tmpdir).find_date(htmlstring) is not None
+        # bounded number of results on disk
+        cache = ResultCache(maxsize=1, directory=tmpdir, disksize=2)
+        assert len(cache.spilled) == 2
+        for day in range(10, 15):
+            cache.find_date(f"<html><body><p>2016-07-{day}</p></body></html>")
+        assert len(cache.spilled) == 2 and len(os.listdir(tmpdir)) == 2
+        assert cache.find_date("<html><body><p>2016-07-13</p></body></html>")
+        assert cache.hits == 1
+        # everything is cleared, other files are left untouched
+        with open(os.path.join(tmpdir, "other.txt"), "w", encoding="utf-8") as f:
+            f.write("test")
+        cache.clear()
+        assert len(cache) == 0 and os.listdir(tmpdir) == ["other.txt"]
+
+
+def test_routing():
+    """test learned order of extraction steps per domain"""
+    assert get_domain(None) is None
+    assert get_domain("test") is None
+    assert get_domain("https://www.example.org/page") == "example.org"
+    assert get_domain("https://blog.example.org./") == "example.org"
+    assert get_domain("http://news.bbc.co.uk/1/hi") == "bbc.co.uk"
+    assert get_domain("https://www.derstandard.at/story") == "derstandard.at"
+    assert get_domain("https://www.parlament.gv.at/") == "parlament.gv.at"
+    assert get_domain("https://www.faz.de/aktuell") == "faz.de"
+    assert get_domain("https://taz.de/") == "taz.de"
+    assert get_domain("https://orf.at/stories") == "orf.at"
+    assert get_domain("https://nos.nl/artikel") == "nos.nl"
+
+    htmlstring = """<html><head>
+    <meta name="date" content="2017-09-01"/>
+    </head><body><time datetime="2016-07-12" class="entry-date">12 July</time>
+    </body></html>"""
+    router = StageRouter()
+    url = "https://www.example.org/page"
+    assert find_date(htmlstring, url=url, router=router) == "2017-09-01"
+    assert router.get(url) == "header"
+    assert router.get("https://example.com/") is None
+    # learned step tried first
+    router.record("https://example.org/other", "time")
+    router.record("https://example.org/other", "time")
+    assert find_date(htmlstring, url=url, router=router) == "2016-07-12"
+    assert find_date(htmlstring, url="https://example.com", router=router) == (
+        "2017-09-01"
+    )
+    assert find_date(htmlstring, url=url) == "2017-09-01"
+    # fallback on the standard order
+    router.record(url, "time")
+    assert (
+        find_date(
+            "<html><body><p>Updated 2020-03-04</p></body></html>",
+            url=url,
+            router=router,
+        )
+        == "2020-03-04"
+    )
+    # extensive steps are neither recorded nor tried first
+    assert router.domains["example.org"] == {"header": 1, "time": 4}
+    # persistence
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "routes.json")
+        router.save(filename)
+        assert StageRouter.load(filename).get(url) == "time"
+    router = StageRouter({"example.org": {"free_text": 3}})
+    htmlstring = """<html><head><meta name="date" content="2017-09-01"/></head>
+    <body><p>Updated 2020-03-04</p></body></html>"""
+    assert find_date(htmlstring, url=url, router=router) == "2017-09-01"
+
+
+def test_cms():
+    """test CMS detection and the corresponding extraction shortcuts"""
+    assert detect_cms(html.fromstring("<html><body><p>Test</p></body></html>")) is None
+    for generator, expected in (
+        ("WordPress 6.4.2", "wordpress"),
+        ("Blogger", "blogger"),
+        ("Drupal 10 (https://www.drupal.org)", "drupal"),
+        ("Ghost 5.75", "ghost"),
+        ("Joomla! - Open Source Content Management", "joomla"),
+        ("TYPO3 CMS", "typo3"),
+        ("Hugo 0.120.4", None),
+    ):
+        tree = html.fromstring(
+            f'<html><head><meta name="Generator" content="{generator}"/></head><body/></html>'
+        )
+        assert detect_cms(tree) == expected
+    tree = html.fromstring(
+        '<html><head><link rel="stylesheet" href="/wp-content/themes/style.css"/></head></html>'
+    )
+    assert detect_cms(tree) == "wordpress"
+
+    htmlstring = """<html><head><meta name="generator" content="WordPress 6.4"/></head>
+    <body><div class="related-posts"><time class="entry-date published" datetime="2015-05-05">5. Mai</time></div>
+    <div class="posted-on"><time class="entry-date published" datetime="2019-06-28T11:32:59+02:00">28. Juni</time>
+    <time class="updated" datetime="2020-01-14T09:14:33+01:00">14. Januar</time></div>
+    </body></html>"""
+    tree = html.fromstring(htmlstring)
+    updated = Extractor(True, LATEST_POSSIBLE, MIN_DATE, False, OUTPUTFORMAT)
+    assert cms_search(tree, "wordpress", OPTIONS) == "2019-06-28"
+    assert cms_search(tree, "wordpress", updated) == "2020-01-14"
+    assert cms_search(tree, "ghost", OPTIONS) is None
+    assert cms_search(tree, None, OPTIONS) is None
+    # nested text at element locations, large subtrees are not read entirely
+    tree = html.fromstring(
+        '<html><body><h2 class="date-header"><span>Tuesday, March 5, 2019</span>'
+        + "<p>Text</p>" * 10000
+        + "</h2></body></html>"
+    )
+    assert cms_search(tree, "blogger", OPTIONS) == "2019-03-05"
+    assert find_date(htmlstring, original_date=True) == "2019-06-28"
+    assert find_date(htmlstring) == "2020-01-14"
+
+    blogger = """<html><head><meta name="generator" content="Blogger"/></head><body>
+    <h2 class="date-header"><span>Friday, September 1, 2017</span></h2></body></html>"""
+    assert find_date(blogger, original_date=True) == "2017-09-01"
+
+
+def test_lazy_logging():
+    """test that elements are only serialized if debug messages are emitted"""
+    htmlstring = '<html><head><meta name="date" content="2017-09-01"/></head></html>'
+    elem = html.fromstring(htmlstring).find(".//meta")
+    assert str(LazyElement(elem)) == '<meta name="date" content="2017-09-01">'
+    with patch("htmldate.core.logstring", wraps=logstring) as mock_logstring:
+        assert find_date(htmlstring) == "2017-09-01"
+        mock_logstring.assert_not_called()
+        logger = logging.getLogger("htmldate.core")
+        handler, level = logging.StreamHandler(io.StringIO()), logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            assert find_date(htmlstring) == "2017-09-01"
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+        assert "examining meta name: <meta" in handler.stream.getvalue()
+        mock_logstring.assert_called()
+
+
+def test_trace():
+    """test the per-call record of extraction steps"""
+    htmlstring = '<html><head><meta name="date" content="2017-09-01"/></head></html>'
+    trace = Trace()
+    assert find_date(htmlstring, trace=trace) == "2017-09-01"
+    assert trace.steps == ["url", "header"]
+    assert trace.result == "2017-09-01"
+    assert [event.result for event in trace] == [None, "2017-09-01"]
+    assert trace.duration >= 0 and len(trace) == 2
+    assert trace.to_dict()["steps"][1]["result"] == "2017-09-01"
+    assert str(trace).endswith("result: 2017-09-01")
+
+    trace = Trace()
+    assert find_date("<html><body><p>Test</p></body></html>", trace=trace) is None
+    assert trace.steps[-1] == "search_page" and trace.result is None
+    trace = Trace()
+    find_date("<html><body><p>Test</p></body></html>", False, trace=trace)
+    assert "search_page" not in trace.steps
+
+    trace = Trace()
+    headers = {
+        "Date": "Mon, 04 Mar 2024 10:00:00 GMT",
+        "Last-Modified": "Fri, 01 Mar 2024 10:00:00 GMT",
+    }
+    assert find_date(htmlstring, headers=headers, trace=trace) == "2024-03-01"
+    assert trace.steps == ["http_headers"]
+
+    cache, trace = ResultCache(), Trace()
+    cache.find_date(htmlstring, trace=Trace())
+    assert cache.find_date(htmlstring, trace=trace) == "2017-09-01"
+    assert trace.steps == ["result_cache"] and cache.hits == 1
+
+
+def test_metrics():
+    """test the registry of stage and cache metrics"""
+    registry = MetricsRegistry(buckets=(0.001, 0.01))
+    registry.observe("header", "2017-09-01", 0.0005)
+    registry.observe("header", None, 0.005)
+    registry.observe("time", None, 2.0)
+    registry.count("external_date_parser_calls")
+    snapshot = registry.snapshot()
+    assert snapshot["stages"]["header"]["found"] == 1
+    assert snapshot["stages"]["header"]["none"] == 1
+    assert snapshot["stages"]["header"]["latency"]["count"] == 2
+    assert list(snapshot["stages"]["time"]["latency"]["buckets"].values()) == [0, 0, 1]
+    assert snapshot["counters"]["external_date_parser_calls"] == 1
+    assert "try_date_expr" in snapshot["caches"]
+    text = registry.to_prometheus()
+    assert 'htmldate_stage_results_total{stage="header",outcome="found"} 1' in text
+    assert 'htmldate_stage_duration_seconds_bucket{stage="header",le="0.01"} 2' in text
+    assert 'htmldate_stage_duration_seconds_bucket{stage="time",le="+Inf"} 1' in text
+    assert "htmldate_external_date_parser_calls_total 1" in text
+    assert 'htmldate_cache_hits_total{cache="is_valid_date"}' in text
+    # metric families of the counters are declared without suffix
+    assert "# TYPE htmldate_stage_results counter" in text
+    assert "# TYPE htmldate_external_date_parser_calls counter" in text
+    assert "# TYPE htmldate_cache_misses counter" in text
+    assert "# TYPE htmldate_cache_size gauge" in text
+    assert "_total counter" not in text
+    registry.reset()
+    assert registry.snapshot()["stages"] == {}
+
+    # global registry, disabled by default
+    assert not METRICS.enabled
+    find_date("<html><body><p>Test</p></body></html>")
+    assert METRICS.snapshot()["stages"] == {}
+    reset_caches()
+    METRICS.enable()
+    try:
+        find_date("<html><body><p>Published on 3rd of March in 2017</p></body></html>")
+        find_date("<html><body><p>Published on 3rd of March in 2017</p></body></html>")
+    finally:
+        METRICS.disable()
+    snapshot = METRICS.snapshot()
+    METRICS.reset()
+    assert snapshot["stages"]["url"]["none"] == 2
+    assert snapshot["stages"]["search_page"]["found"] == 2
+    assert snapshot["counters"]["external_date_parser_calls"] == 1
+    assert cache_stats()["try_date_expr"]["hits"] >= 1
+    assert set(cache_stats()) <= {func.__name__ for func in CACHED_FUNCTIONS}
+
+
+def test_element_text():
+    """test that only the beginning of the text content is collected"""
+    htmlstring = (
+        '<div class="date">Published: <b>12 May 2017</b>  '
+        + "<p>Text</p>" * 100
+        + "</div>"
+    )
+    elem = html.fromstring(htmlstring)
+    text = element_text(elem)
+    assert len(text) < len(elem.text_content())
+    assert (
+        trim_text(text)[:MAX_SEGMENT_LEN]
+        == trim_text(elem.text_content())[:MAX_SEGMENT_LEN]
+    )
+    assert element_text(html.fromstring("<div>a<p>b</p>c</div>")) == "abc"
+    tree = html.fromstring(
+        "<html><body>"
+        + '<div class="date">' * 50
+        + htmlstring
+        + "</div>" * 50
+        + "</body></html>"
+    )
+    assert examine_date_elements(tree, './/div[@class="date"]', OPTIONS) == "2017-05-12"
+
+
+def test_guarded_scan():
+    """test the scanning of long strings in windows and adversarial inputs"""
+    pattern = re.compile(r"\D([0-9]{4})-([0-9]{2})\D")
+    text = "x" * (SCAN_WINDOW - 5) + " 2017-05 " + "y" * SCAN_WINDOW + " 2018-06 "
+    assert findall_windows(pattern, text) == pattern.findall(text)
+    assert findall_windows(pattern, text) == [("2017", "05"), ("2018", "06")]
+    assert search_windows(pattern, text)[1] == "2017"
+    assert search_windows(pattern, text[SCAN_WINDOW:])[1] == "2018"
+    assert search_windows(pattern, "x" * 3 * SCAN_WINDOW) is None
+    # matches across the border are found once
+    text = " 2017 " * (2 * SCAN_WINDOW // 6)
+    assert findall_windows(re.compile(r"\d{4}"), text) == re.findall(r"\d{4}", text)
+    # matches longer than the overlap can be missed
+    text = "a" * (SCAN_WINDOW + SCAN_OVERLAP + 10)
+    assert findall_windows(re.compile("a+"), text) != [text]
+
+    # patterns with a bounded cost on adversarial inputs
+    start = time.perf_counter()
+    assert COPYRIGHT_PATTERN.search("©" * 20000) is None
+    assert COPYRIGHT_PATTERN.search("© 2016 ©" + " " * 100 + "x") is not None
+    assert TEXT_PATTERNS.search("güncelleme" + " " * 20000 + "x") is None
+    assert TEXT_PATTERNS.search("Güncelleme tarihi : 12.05.2017 ") is not None
+    assert time.perf_counter() - start < 1
+
+    htmlstring = (
+        "<html><body><p>"
+        + "Lorem ipsum " * 3000
+        + "</p><p>Veröffentlicht am 12.05.2017</p></body></html>"
+    )
+    assert (
+        find_date(htmlstring, guarded_scan=True)
+        == find_date(htmlstring)
+        == "2017-05-12"
+    )
+    assert find_date("<html><body>" + "©" * 50000 + "</body></html>") is None
+
+
+def test_compile_pattern():
+    """test the compilation with the optional RE2 engine and the fallback"""
+    pattern = compile_pattern(r"\D(\d{4})-(\d{2})\D", re.I)
+    assert pattern.findall(" 2017-05 2018-06 ") == [("2017", "05")]
+    assert pattern.search(" 2017-05 ")[1] == "2017"
+    assert findall_windows(pattern, " 2017-05 2018-06 ") == [("2017", "05")]
+    assert compile_pattern("date", re.I).search("DATE") is not None
+    # lookbehind and other flags are handled by the re module
+    assert isinstance(compile_pattern(r"(?<!w3.org)\D\d{4}"), re.Pattern)
+    assert isinstance(compile_pattern(r"\d", re.M), re.Pattern)
+    # same results with both engines
+    match = LONG_TEXT_PATTERN.search("Published on March 3rd, 2017")
+    assert match.lastgroup == "year" and match.group("month", "day") == ("March", "3")
+    assert TEXT_PATTERNS.search("<p>date of publication: 12/05/2017</p>").groups()[
+        :3
+    ] == ("12", "05", "2017")
+    # Unicode character classes as in the re module
+    assert LONG_TEXT_PATTERN.search("Posted on March\xa012, 2016") is not None
+    for cls, text in ((r"\s", "\xa0\u2009\u3000"), (r"\d", "٣۴"), (r"\w", "éß_")):
+        assert "".join(compile_pattern(cls).findall(text)) == text
+        assert compile_pattern(cls.upper()).findall(text) == []
+    assert compile_pattern(r"[^\s]+").findall("a\xa0b") == ["a", "b"]
+    assert isinstance(compile_pattern(r"[\S]"), re.Pattern)
+    assert isinstance(compile_pattern(r"[0-9]{10}\b"), re.Pattern)
+    htmlstring = (
+        '<html><body><div title="Posted on March&nbsp;12, 2016"></div></body></html>'
+    )
+    assert find_date(html.fromstring(htmlstring)) == "2016-03-12"
+    # engine of the patterns scanning whole documents, lookarounds need re
+    fallback = {"COPYRIGHT_PATTERN", "SIMPLE_PATTERN"}
+    for name in (
+        "COMPACT_URL",
+        "COPYRIGHT_PATTERN",
+        "DATESTRINGS_PATTERN",
+        "JSON_KEYS",
+        "LONG_TEXT_PATTERN",
+        "MMYYYY_PATTERN",
+        "PARTIAL_URL",
+        "QUERY_URL",
+        "SELECT_YMD_PATTERN",
+        "SIMPLE_PATTERN",
+        "SLASHES_PATTERN",
+        "STATE_KEYS",
+        "TEXT_PATTERNS",
+        "THREE_LOOSE_PATTERN",
+        "TIMESTAMP_PATTERN",
+        "YYYYMM_PATTERN",
+    ):
+        pattern = getattr(extractors, name)
+        assert isinstance(pattern, re.Pattern) == (
+            name in fallback or utils.re2 is None
+        ), name
+
+
+def test_mask_html():
+    """test the search on the source string instead of the serialized tree"""
+    htmlstring = "<html><body><p>Text</p></body></html>"
+    assert mask_html(htmlstring) is htmlstring
+    assert (
+        mask_html("<p>a<SVG><svg>2016</svg><path/></SVG>b<embed src='x'>c</p>")
+        == "<p>abc</p>"
+    )
+    assert mask_html("<p>a<video/>b</video>c</p>") == "<p>ab</video>c</p>"
+    assert mask_html("<p>a<labelx>b</p>") == "<p>a<labelx>b</p>"
+    # unclosed elements are kept
+    assert mask_html("<p>a<iframe>b</p>") == "<p>a<iframe>b</p>"
+    # comments and raw text are not parsed, character references are decoded
+    assert mask_html("<!-- <svg> --><p>a<svg>b</svg></p>") == "<!-- <svg> --><p>a</p>"
+    assert (
+        mask_html("<script>'<svg>'</SCRIPT><p>a<svg>b</svg></p>")
+        == "<script>'<svg>'</SCRIPT><p>a</p>"
+    )
+    assert mask_html("<style>p { }</style><svg>") == "<style>p { }</style><svg>"
+    assert (
+        mask_html(
+            "<p title='&copy;'>a&nbsp;b&#160;c&#xA0;d&lt;&amp;&quot;&unknown;</p>"
+        )
+        == "<p title='©'>a\xa0b\xa0c\xa0d&lt;&amp;&quot;&unknown;</p>"
+    )
+    assert mask_html("<!-- &nbsp; --><script>&nbsp;</script>&nbsp") == (
+        "<!-- &nbsp; --><script>&nbsp;</script>\xa0"
+    )
+    # same results for strings and trees
+    for htmlstring, expected in (
+        (
+            "<html><body><!-- <svg> --><p>Some text here</p><svg><text>Updated 2005-03-04 10:00:00</text></svg><p>more text</p></body></html>",
+            None,
+        ),
+        (
+            '<html><body><div title="Posted on March&nbsp;12, 2016"></div></body></html>',
+            "2016-03-12",
+        ),
+    ):
+        assert find_date(htmlstring) == find_date(load_html(htmlstring)) == expected
+
+    htmlstring = """<html><body><p>Last update: 2017-05-12 10:32:11</p>
+    <iframe>Copyright 2016</iframe><footer>© 2015-2016</footer></body></html>"""
+    tree = load_html(htmlstring)
+    state = DocumentContext(tree, source=htmlstring)
+    assert "2017-05-12" in state.htmlstring and "iframe" not in state.htmlstring
+    assert state.htmlstring == mask_html(htmlstring)
+    with patch("htmldate.core.tostring") as mock_tostring:
+        assert find_date(htmlstring) == find_date(htmlstring.encode()) == "2017-05-12"
+        mock_tostring.assert_not_called()
+    assert find_date(load_html(htmlstring)) == "2017-05-12"
+    # the toolbar of archived pages is discarded from the tree
+    state = DocumentContext(load_html(htmlstring), source=htmlstring + "wm-ipp")
+    assert "<footer>" in state.htmlstring and "iframe" not in state.htmlstring
+
+
+def test_document_context():
+    """test the lazy artifacts of a parsed document and their re-use"""
+    htmlstring = """<html><head>
+    <link rel="canonical" href="https://example.org/blog/entry.html"/>
+    <meta property="article:published_time" content="2017-05-12"/>
+    </head><body><svg>2016</svg><p>Updated: 2018-09-01</p>
+    <p>Last edited on 2018-09-03</p></body></html>"""
+    assert load_context("<html><body>Text</body></html>") is not None
+    assert load_context("Text") is None
+    context = load_context(htmlstring)
+    assert context.url == "https://example.org/blog/entry.html"
+    assert load_context(htmlstring, url="https://example.net/").url == (
+        "https://example.net/"
+    )
+    # nothing is computed if the header suffices
+    assert find_date(context, original_date=True) == "2017-05-12"
+    assert context._search_tree is None and context._htmlstring is None
+    # the artifacts are computed once
+    assert find_date(context, original_date=False) == find_date(htmlstring)
+    search_tree, segments = context.search_tree, context.segments
+    assert context.tree is not search_tree and "svg" not in context.htmlstring
+    assert context.tree.find(".//svg") is not None
+    assert "Last edited on 2018-09-03" in segments
+    assert find_date(context, max_date="2018-01-01") == find_date(
+        htmlstring, max_date="2018-01-01"
+    )
+    assert context.search_tree is search_tree and context.segments is segments
+    # single pass: the parsed document is pruned in place
+    context = load_context(htmlstring, copy_tree=False)
+    assert context.search_tree is context.tree
+    # trees given as input are not modified
+    tree = html.fromstring(htmlstring)
+    context = load_context(tree, copy_tree=False)
+    assert context.search_tree is not tree and context.source is None
+    assert tree.find(".//svg") is not None
+    assert ResultCache().find_date(context) == find_date(htmlstring)
+
+
+def test_find_dates():
+    """test several sets of options on a single parse"""
+    htmlstring = """<html><head>
+    <meta property="article:published_time" content="2017-05-12"/>
+    <meta property="article:modified_time" content="2018-09-01"/>
+    </head><body><p class="date">Published on 3 March 2016</p></body></html>"""
+    variants = [
+        {"original_date": True},
+        {"original_date": False},
+        {"original_date": True, "max_date": "2017-01-01"},
+        {"original_date": True, "outputformat": "%d %B %Y"},
+    ]
+    expected = [find_date(htmlstring, **variant) for variant in variants]
+    assert expected == ["2017-05-12", "2018-09-01", "2016-03-03", "12 May 2017"]
+    assert find_dates(htmlstring, variants) == expected
+    assert find_dates(htmlstring.encode("utf-8"), variants) == expected
+    assert find_dates(html.fromstring(htmlstring), variants) == expected
+    context = load_context(htmlstring)
+    assert find_dates(context, variants) == expected
+    # the elements are only selected once
+    elements = context.select(DATE_ELEMENTS[True])
+    assert list(context._elements) == [DATE_ELEMENTS[True]]
+    assert find_date(context, max_date="2017-01-01") == "2016-03-03"
+    assert context.select(DATE_ELEMENTS[True]) is elements
+    assert find_dates(htmlstring, [{"extensive_search": False}] * 2) == [
+        "2018-09-01",
+        "2018-09-01",
+    ]
+    assert find_dates(htmlstring, []) == []
+    # the tree is left intact: same results in any order of the variants
+    htmlstring = '<html><body><p>Text text text</p><label><abbr class="published" title="2016-05-06">May 6</abbr></label><p>2010-01-01 10:00:00</p></body></html>'
+    limits = [{"max_date": "2015-01-01"}, {}]
+    expected = [find_date(htmlstring, original_date=True, **v) for v in limits]
+    assert expected == ["2010-01-01", "2016-05-06"]
+    assert find_dates(htmlstring, limits, original_date=True) == expected
+    assert find_dates(htmlstring, limits[::-1], original_date=True) == expected[::-1]
+    context = load_context(htmlstring)
+    assert find_date(context, original_date=True, max_date="2015-01-01") == expected[0]
+    assert find_date(context, original_date=True) == expected[1]
+    assert context.tree.find(".//label") is not None
+    # same with a learned route starting on the pruned tree
+    router = StageRouter({"example.org": {"time": 1}})
+    url = "https://example.org/"
+    assert find_date(htmlstring, original_date=True, url=url, router=router) == (
+        "2016-05-06"
+    )
+    # common options and documents which cannot be parsed
+    assert find_dates("<html></html>", variants[:2], max_date="2018-01-01") == [
+        None,
+        None,
+    ]
+    headers = {"Last-Modified": "Wed, 05 Jun 2019 10:00:00 GMT"}
+    assert find_dates("Text", variants[:2], headers=headers) == [
+        "2019-06-05",
+        "2019-06-05",
+    ]
+
+
+def test_candidates():
+    """test the collection of all dates found in a document"""
+    htmlstring = """<html><head>
+    <link rel="canonical" href="https://example.org/2016/03/01/entry.html"/>
+    <meta property="article:published_time" content="2017-05-12"/>
+    <meta property="article:modified_time" content="2018-09-01"/>
+    </head><body><p class="date">Published on 3 March 2016</p>
+    <footer>© 2015-2019</footer></body></html>"""
+    candidates = find_date_candidates(htmlstring)
+    assert candidates[0].date == find_date(htmlstring) == "2016-03-01"
+    assert candidates[0].source == "url" and candidates[0].score == 1.0
+    assert [c.date for c in candidates][:3] == [
+        "2016-03-01",
+        "2018-09-01",
+        "2016-03-03",
+    ]
+    assert all(a.score > b.score for a, b in zip(candidates, candidates[1:]))
+    assert len({c.date for c in candidates}) == len(candidates)
+    assert all(c.source == c.sources[0] for c in candidates)
+    candidates = find_date_candidates(
+        htmlstring, original_date=True, deferred_url_extractor=True
+    )
+    assert candidates[0].date == "2017-05-12" and candidates[0].source == "header"
+    assert "url" in candidates[[c.date for c in candidates].index("2016-03-01")].sources
+    assert [c.date for c in find_date_candidates(htmlstring, max_date="2017-01-01")][
+        :2
+    ] == ["2016-03-01", "2016-03-03"]
+    assert find_date_candidates(htmlstring, outputformat="%Y")[0].date == "2016"
+    assert find_date_candidates(htmlstring, outputformat="ABC") == []
+    assert find_date_candidates("<html><body>Text</body></html>") == []
+    # HTTP headers first for the updated date, last for the original date
+    headers = {"Last-Modified": "Wed, 05 Jun 2019 10:00:00 GMT"}
+    candidates = find_date_candidates(htmlstring, headers=headers)
+    assert candidates[0].date == "2019-06-05" == find_date(htmlstring, headers=headers)
+    candidates = find_date_candidates(htmlstring, original_date=True, headers=headers)
+    assert candidates[-1].source == "http_headers"
+    assert [c.date for c in find_date_candidates("Text", headers=headers)] == [
+        "2019-06-05"
+    ]
+
+
+def test_find_date_in_text():
+    """test the extraction from plain text"""
+    assert find_date_in_text("") is None
+    assert find_date_in_text("Published on March 3, 2017 by John") == "2017-03-03"
+    assert find_date_in_text("By Jane Doe | 12.05.2016 | 10:30") == "2016-05-12"
+    assert find_date_in_text("Posted: 2017-05-12T10:00:00Z") == "2017-05-12"
+    assert (
+        find_date_in_text("Published on March 3, 2017", outputformat="%d %B %Y")
+        == "03 March 2017"
+    )
+    assert find_date_in_text("Published on March 3, 2017", outputformat="ABC") is None
+    assert (
+        find_date_in_text("Published on March 3, 2017", max_date="2016-12-31") is None
+    )
+    # longer text
+    text = "Lorem ipsum dolor sit amet. " * 20
+    assert find_date_in_text(text) is None
+    assert find_date_in_text(text + "Last updated: 2019-04-03. " + text) == "2019-04-03"
+    assert find_date_in_text(text + "on the 3rd of March 2017 " + text) == "2017-03-03"
+    # opportunistic search only with extensive search
+    assert find_date_in_text(text + "© 2015 Example Inc.") == "2015-01-01"
+    assert (
+        find_date_in_text(text + "© 2015 Example Inc.", extensive_search=False) is None
+    )
+    # no parsing involved
+    with patch("htmldate.core.load_html") as mock_load:
+        assert find_date_in_text("Published on March 3, 2017") == "2017-03-03"
+        mock_load.assert_not_called()
+    # dates at the edges of long strings
+    filler = "x" * MAX_SEGMENT_LEN
+    assert find_date_in_text(f"{filler} 2016-05-12") == "2016-05-12"
+    assert find_date_in_text(f"2016-05-12{filler}") == "2016-05-12"
+    assert find_date_in_text(f"{filler} 12.05.2016") == "2016-05-12"
+
+
+def test_find_dates_from_urls():
+    """test the extraction from URLs only"""
+    urls = [
+        "http://example.com/category/2016/07/12/key-words",
+        "http://example.com/2016/key-words",
+        "http://www.kreditwesen.org/widerstand-berlin/6666-42-87/",
+        "https://www.pamelaandersonfoundation.org/news/2019/6/26/dm4wjh7skxerzzw8qa8cklj8xdri5j",
+        "2016-07-12",
+        "https://example.org/news/20210312-title.html",
+        "https://example.org/article_20210312",
+        "https://example.org/item/120210312345",
+        "https://example.org/article?id=1&date=2021-03-12",
+        "https://example.org/article?pubdate=20210312#top",
+        "https://example.org/2021/03/title",
+        "https://example.org/été/2021-02-30/",
+    ]
+    options = Extractor(True, LATEST_POSSIBLE, MIN_DATE, False, OUTPUTFORMAT)
+    results = find_dates_from_urls(urls)
+    assert results == [
+        "2016-07-12",
+        None,
+        None,
+        "2019-06-26",
+        None,
+        "2021-03-12",
+        "2021-03-12",
+        None,
+        "2021-03-12",
+        "2021-03-12",
+        "2021-03-01",
+        None,
+    ]
+    # same results as for single URLs
+    for url, result in zip(urls, results):
+        assert extract_url_date(url, options) in (result, None)
+    assert find_dates_from_urls(iter(urls)) == results
+    assert find_dates_from_urls(urls[-2:], extensive_search=False) == [None, None]
+    assert find_dates_from_urls(urls[:1], max_date="2015-01-01") == [None]
+    assert find_dates_from_urls(urls[:1], outputformat="%d %B %Y") == ["12 July 2016"]
+    assert find_dates_from_urls(urls[:1], outputformat="ABC") == [None]
+    assert not find_dates_from_urls([])
+    # batches of URLs
+    with patch("htmldate.core.URL_BATCH_SIZE", 2):
+        assert find_dates_from_urls(urls) == results
+    # line breaks do not shift the results
+    assert find_dates_from_urls(["a\nb", urls[0]]) == [None, "2016-07-12"]
+
+    # command-line interface
+    args = parse_args(["--urls-only"])
+    f = io.StringIO()
+    with (
+        patch.object(sys, "stdin", io.StringIO("\n".join(urls[:3]))),
+        redirect_stdout(f),
+    ):
+        process_args(args)
+    assert f.getvalue() == f"{urls[0]}\t2016-07-12\n{urls[1]}\tNone\n{urls[2]}\tNone\n"
+    # with a file and extensive search
+    args = parse_args(
+        ["--urls-only", "-f", "-i", os.path.join(TEST_DIR, "testlist.txt")]
+    )
+    f = io.StringIO()
+    with redirect_stdout(f):
+        process_args(args)
+    assert f.getvalue() == "https://httpbun.com/html\tNone\n"
+
+
+def test_find_feed_dates():
+    """test the extraction from sitemaps and feeds"""
+    sitemap = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:news="http://www.google.com/schemas/sitemap-news/0.9" xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+<url><loc>https://example.org/a</loc><lastmod>2021-03-12T10:00:00+00:00</lastmod></url>
+<url><loc>https://example.org/b</loc><image:image><image:loc>https://example.org/b.jpg</image:loc></image:image>
+<news:news><news:publication_date>2021-03-01</news:publication_date></news:news><lastmod>2021-03-15</lastmod></url>
+<url><loc>https://example.org/c</loc></url>
+<url><lastmod>2021-03-15</lastmod></url>
+</urlset>"""
+    assert list(find_feed_dates(sitemap)) == [
+        ("https://example.org/a", "2021-03-12"),
+        ("https://example.org/b", "2021-03-15"),
+        ("https://example.org/c", None),
+    ]
+    assert list(find_feed_dates(sitemap, original_date=True))[1] == (
+        "https://example.org/b",
+        "2021-03-01",
+    )
+    assert list(find_feed_dates(sitemap, max_date="2021-03-14"))[1] == (
+        "https://example.org/b",
+        "2021-03-01",
+    )
+    assert next(find_feed_dates(sitemap, outputformat="%d %B %Y")) == (
+        "https://example.org/a",
+        "12 March 2021",
+    )
+    assert not list(find_feed_dates(sitemap, outputformat="ABC"))
+    # sitemap index, compressed
+    index = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+<sitemap><loc>https://example.org/sitemap1.xml.gz</loc><lastmod>2004-10-01T18:23:17+00:00</lastmod></sitemap>
+</sitemapindex>"""
+    assert list(find_feed_dates(gzip.compress(index))) == [
+        ("https://example.org/sitemap1.xml.gz", "2004-10-01")
+    ]
+    # RSS and Atom feeds
+    rss = b"""<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/"><channel>
+<lastBuildDate>Sat, 13 Mar 2021 10:00:00 GMT</lastBuildDate>
+<item><title>A</title><link>https://example.org/a</link><pubDate>Fri, 12 Mar 2021 10:00:00 GMT</pubDate></item>
+<item><guid>https://example.org/b</guid><dc:date>2020-01-02</dc:date></item>
+</channel></rss>"""
+    assert list(find_feed_dates(io.BytesIO(rss))) == [
+        ("https://example.org/a", "2021-03-12"),
+        ("https://example.org/b", "2020-01-02"),
+    ]
+    atom = b"""<feed xmlns="http://www.w3.org/2005/Atom"><updated>2021-03-20T00:00:00Z</updated>
+<entry><id>tag:example.org,2021:a</id><link rel="self" href="https://example.org/self"/>
+<link href="https://example.org/a"/><published>2021-03-01T00:00:00Z</published>
+<updated>2021-03-05T00:00:00Z</updated></entry></feed>"""
+    assert list(find_feed_dates(atom)) == [("https://example.org/a", "2021-03-05")]
+    assert list(find_feed_dates(atom, original_date=True)) == [
+        ("https://example.org/a", "2021-03-01")
+    ]
+    # files, truncated documents and entities
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "sitemap.xml.gz")
+        with gzip.open(filename, "wb") as outputfile:
+            outputfile.write(sitemap)
+        assert len(list(find_feed_dates(filename))) == 3
+        assert not list(find_feed_dates(os.path.join(directory, "missing.xml")))
+    assert list(find_feed_dates(sitemap[:-20])) == [
+        ("https://example.org/a", "2021-03-12"),
+        ("https://example.org/b", "2021-03-15"),
+        ("https://example.org/c", None),
+    ]
+    entity = b"""<?xml version="1.0"?><!DOCTYPE urlset [<!ENTITY e SYSTEM "file:///etc/passwd">]>
+<urlset><url><loc>&e;</loc><lastmod>2021-03-15</lastmod></url></urlset>"""
+    assert not list(find_feed_dates(entity))
+
+
+def test_json_search():
+    """test the extraction from JSON-LD data"""
+
+    def json_date(data, original=False, extensive=True, max_date=LATEST_POSSIBLE):
+        tree = html.fromstring(
+            f'<html><head><script type="application/ld+json">{data}</script></head><body></body></html>'
+        )
+        options = Extractor(extensive, max_date, MIN_DATE, original, OUTPUTFORMAT)
+        return json_search(tree, options)
+
+    graph = """{"@context": "https://schema.org", "@graph": [
+        {"@type": "WebPage", "name": "Page"},
+        {"@type": "NewsArticle", "datePublished" : "2021-03-12T10:00:00+01:00",
+         "dateModified": "2021-04-01T08:00:00Z"}]}"""
+    assert json_date(graph, original=True) == "2021-03-12"
+    assert json_date(graph) == "2021-04-01"
+    assert json_date("[" + graph + "]", original=True) == "2021-03-12"
+    # main entity before nested ones
+    nested = """{"@type": "Article", "comment": [{"datePublished": "2022-01-01"}],
+        "datePublished": "2021-03-12"}"""
+    assert json_date(nested, original=True) == "2021-03-12"
+    # other keys and values
+    assert (
+        json_date('{"@type": "VideoObject", "uploadDate": "2020-05-06"}', True)
+        == "2020-05-06"
+    )
+    assert (
+        json_date('{"datePublished": "2021-03-12", "uploadDate": "2020-05-06"}', True)
+        == "2021-03-12"
+    )
+    assert (
+        json_date('{"uploadDate": "2020-05-06", "datePublished": "2021-03-12"}', True)
+        == "2021-03-12"
+    )
+    assert (
+        json_date('{"datePublished": {"@value": "2021-03-12"}}', True) == "2021-03-12"
+    )
+    # case of the keys
+    assert json_date('{"datepublished": "2020-01-05"}', True) == "2020-01-05"
+    assert json_date('{"DatePublished": "2020-01-05"}', True) == "2020-01-05"
+    assert json_date('{"DATEMODIFIED": "2020-01-06"}') == "2020-01-06"
+    assert (
+        json_date('{"datePublished": ["2021-03-12", "2021-03-13"]}', True)
+        == "2021-03-12"
+    )
+    assert json_date('{"datePublished": "March 12, 2021"}', True) == "2021-03-12"
+    assert json_date('{"datePublished": "2021-03-12"}') is None
+    assert (
+        json_date(
+            '{"datePublished": "2021-03-12"}',
+            True,
+            max_date=datetime.datetime(2020, 1, 1),
+        )
+        is None
+    )
+    # invalid values are skipped
+    assert (
+        json_date(
+            '[{"datePublished": "2031-03-12"}, {"datePublished": "2021-03-12"}]', True
+        )
+        == "2021-03-12"
+    )
+    assert json_date('{"datePublished": "no date"}', True) is None
+    # malformed and large data
+    assert json_date('{"datePublished" :"2021-03-12",}', True) == "2021-03-12"
+    assert (
+        json_date('<!--{"datepublished": "2021-03-12T10:00"}-->', True) == "2021-03-12"
+    )
+    with patch("htmldate.extractors.MAX_JSON_SIZE", 10):
+        assert json_date(graph, original=True) == "2021-03-12"
+        assert json_date(graph) == "2021-04-01"
+    assert (
+        json_date('{"datePublished": "2021-03-12"' + "}" * 20000, True) == "2021-03-12"
+    )
+    assert (
+        json_date("[" * 100000 + '"datePublished": "2021-03-12"', True) == "2021-03-12"
+    )
+
+
+def test_state_search():
+    """test the extraction from the state of JavaScript frameworks"""
+
+    def state_date(script, original=False, max_date=LATEST_POSSIBLE):
+        tree = html.fromstring(f"<html><body><div></div>{script}</body></html>")
+        options = Extractor(True, max_date, MIN_DATE, original, OUTPUTFORMAT)
+        return state_search(tree, options)
+
+    nextjs = """<script id="__NEXT_DATA__" type="application/json">{"props":{"pageProps":
+        {"article":{"title":"A","publishedAt" : "2021-03-12T10:00:00.000Z",
+        "updatedAt":"2021-04-01T08:00:00.000Z","author":{"createdAt":"2015-01-01"}}}}}</script>"""
+    assert state_date(nextjs, original=True) == "2021-03-12"
+    assert state_date(nextjs) == "2021-04-01"
+    assert (
+        state_date(nextjs, original=True, max_date=datetime.datetime(2020, 1, 1))
+        is None
+    )
+    # unquoted keys and timestamps
+    nuxt = '<script>window.__NUXT__={data:[{post:{published_at:"2020-05-06 10:00",title:a}}]}</script>'
+    assert state_date(nuxt, original=True) == "2020-05-06"
+    apollo = '<script>window.__APOLLO_STATE__={"Post:1":{"firstPublishedAt":1574404261205,"updatedAt":1576185463}}</script>'
+    assert state_date(apollo, original=True) == "2019-11-22"
+    assert state_date(apollo) == "2019-12-12"
+    # timestamps have 10 or 13 digits
+    assert state_date(apollo.replace("1576185463", "15761854630")) is None
+    assert state_date(apollo.replace("1576185463", "1576185463.5")) == "2019-12-12"
+    # preferred keys first, other scripts ignored
+    redux = '<script>window.__PRELOADED_STATE__ = {"publicationDate":"2019-01-01","datePublished":"2020-02-02"}</script>'
+    assert state_date(redux, original=True) == "2020-02-02"
+    assert state_date(redux.replace("__PRELOADED_STATE__", "dataLayer"), True) is None
+    assert (
+        state_date(
+            '<script id="__NEXT_DATA__">{"publishedAt":"soon","date":"2021-01-01"}</script>',
+            True,
+        )
+        is None
+    )
+    # stage of the extraction
+    document = f"<html><body><p>Text</p>{nextjs}</body></html>"
+    assert find_date(document, original_date=True) == "2021-03-12"
+    assert find_date_candidates(document, original_date=True)[0].source == "state"
+
+
+def test_extract_date_metadata():
+    """test the collection of date-bearing fields"""
+    document = """<html><head>
+<meta property="article:published_time" content="2021-03-12T10:00:00+01:00"/>
+<meta property="article:modified_time" content="2021-04-01T10:00:00+01:00"/>
+<meta name="DC.date.issued" content="2021-03-11"/>
+<meta name="og:url" content="https://example.org/2021/03/10/title"/>
+<meta http-equiv="last-modified" content="Fri, 02 Apr 2021 10:00:00 GMT"/>
+<meta itemprop="copyrightYear" content="2020"/>
+<meta name="description" content="2021-01-01"/><meta name="date" content=""/>
+</head><body><article><span itemprop="dateCreated">March 9, 2021</span>
+<time class="entry-date" datetime="2021-03-12">12 March</time><time>yesterday</time>
+<abbr class="published" title="2021-03-12">March 12</abbr><abbr data-utime="1615543200">x</abbr>
+<time itemprop="dateModified" datetime="2021-04-01">1 April</time>
+<span property="dc:created" content="2031-03-08">x</span></article></body></html>"""
+    fields = extract_date_metadata(document)
+    assert all(isinstance(field, DateField) for field in fields)
+    assert [(f.name, f.markup, f.kind, f.date) for f in fields] == [
+        ("article:published_time", "property", "published", "2021-03-12"),
+        ("article:modified_time", "property", "modified", "2021-04-01"),
+        ("dc.date.issued", "name", "published", "2021-03-11"),
+        ("og:url", "name", "url", "2021-03-10"),
+        ("last-modified", "http-equiv", "modified", "2021-04-02"),
+        ("copyrightyear", "itemprop", "copyright", "2020-01-01"),
+        ("datecreated", "itemprop", "published", "2021-03-09"),
+        ("datetime", "time", "published", "2021-03-12"),
+        ("text", "time", "date", None),
+        ("title", "abbr", "published", "2021-03-12"),
+        ("data-utime", "abbr", "date", "2021-03-12"),
+        ("datemodified", "itemprop", "modified", "2021-04-01"),
+        ("dc:created", "property", "published", None),
+    ]
+    assert fields[4].value == "Fri, 02 Apr 2021 10:00:00 GMT"
+    # options and input types
+    fields = extract_date_metadata(
+        html.fromstring(document), outputformat="%d %B %Y", max_date="2021-03-31"
+    )
+    assert fields[0].date == "12 March 2021" and fields[1].date is None
+    context = load_context(document)
+    assert [f.date for f in extract_date_metadata(context)][:3] == [
+        "2021-03-12",
+        "2021-04-01",
+        "2021-03-11",
+    ]
+    assert extract_date_metadata(document, outputformat="ABC") == []
+    assert extract_date_metadata("") == []
+    assert extract_date_metadata("<html><body><p>Text</p></body></html>") == []
+    # consistent with the extraction steps
+    assert find_date(document, original_date=True) == "2021-03-12"
+    assert find_date(document) == "2021-04-01"
+
+
 def test_dependencies():
     "Test README examples for consistency"
     assert (
@@ -1705,3 +2870,25 @@ if __name__ == "__main__":
 
     # loading functions
     test_download()
+    test_head_probe()
+    test_http_headers()
+    test_http_cache()
+    test_result_cache()
+    test_routing()
+    test_cms()
+    test_lazy_logging()
+    test_trace()
+    test_metrics()
+    test_element_text()
+    test_guarded_scan()
+    test_compile_pattern()
+    test_mask_html()
+    test_document_context()
+    test_find_dates()
+    test_candidates()
+    test_find_date_in_text()
+    test_find_dates_from_urls()
+    test_find_feed_dates()
+    test_json_search()
+    test_state_search()
+    test_extract_date_metadata()